@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Pun Generator.
+
+Measures cold Lotus() startup, warm per-theme latency over a fixed sample of
+get_expanded_theme_words(), and micro-benchmarks of the hot lookups. Results
+are written as JSON and can be compared against a stored baseline:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json --tolerance 0.2
+
+With --baseline the exit status is 1 when any benchmark's median is slower
+than the baseline by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+# Bump whenever benchmarks are added, removed or change what they measure
+BENCHMARK_FORMAT = 2
+# Seed for the theme sample, so every run times the same themes
+THEME_SAMPLE_SEED = 2024
+# Default allowed slowdown relative to the baseline before failing
+DEFAULT_TOLERANCE = 0.2
+
+# Fixed inputs for the micro-benchmarks
+SIMILARITY_PAIRS = [
+    ("food", "meal"), ("food", "computer"), ("dog", "cat"), ("ocean", "river"),
+    ("money", "bank"), ("music", "song"), ("car", "wheel"), ("tree", "forest"),
+    ("doctor", "nurse"), ("bread", "cake"), ("school", "teacher"), ("rain", "snow"),
+]
+RELATED_WORD_THEMES = ["food", "dog", "ocean", "money", "music", "car", "tree", "doctor"]
+VERB_PHRASE_WORDS = [
+    "meeting", "call", "grind", "hunt", "computing", "cutting", "teaching", "grain",
+    "fiber", "water", "singer", "painting", "runner", "baker", "swimming", "writer",
+]
+HOMOPHONE_WORDS = 1000
+
+# Timed in a fresh interpreter so nothing is already loaded
+COLD_STARTUP_SCRIPT = "from schemata import Lotus; Lotus(display=False)"
+
+
+def summarize(samples, calls=1):
+    """Return the summary statistics recorded for one benchmark."""
+    median = statistics.median(samples)
+    return {
+        "median": median,
+        "min": min(samples),
+        "max": max(samples),
+        "repeats": len(samples),
+        "calls": calls,
+        "per_call": median / calls,
+        "samples": samples,
+    }
+
+
+def time_repeats(func, repeats, setup=None):
+    """Time func() repeats times, calling setup() untimed before each run."""
+    samples = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_cold_startup(repeats):
+    """Time Lotus() in a fresh interpreter, including imports and lexicon load."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    command = [sys.executable, "-W", "ignore", "-c", COLD_STARTUP_SCRIPT]
+    return time_repeats(lambda: subprocess.run(command, env=env, check=True,
+                                               stdout=subprocess.DEVNULL), repeats)
+
+
+def theme_sample(size):
+    """Return a fixed, seeded sample of distinct themes from the expanded list."""
+    from generate_dataset import get_expanded_theme_words
+    themes = sorted(set(get_expanded_theme_words()))
+    return random.Random(THEME_SAMPLE_SEED).sample(themes, min(size, len(themes)))
+
+
+def bench_warm_themes(lotus, themes):
+    """Time generate_themed_pun once per theme on an already warm Lotus."""
+    latencies = {}
+    for theme in themes:
+        start = time.perf_counter()
+        lotus.generate_themed_pun(theme)
+        latencies[theme] = time.perf_counter() - start
+    return latencies
+
+
+def bench_micro(lotus, repeats):
+    """Time the hot lookups, clearing their memo caches before every repeat."""
+    import templates
+    grammar = templates.grammar_processor
+    words = [compound.split('_')[0] for compound in lotus.nplist[:HOMOPHONE_WORDS]]
+
+    def clear_grammar_caches():
+        grammar._verb_cache.clear()
+        grammar._pos_cache.clear()
+        grammar._is_verb_cache.clear()
+        grammar._lemma_cache.clear()
+
+    def clear_related_caches():
+        lotus.resources.related_cache.clear()
+        lotus.resources.synset_cache.clear()
+
+    def clear_similarity_caches():
+        lotus.resources.similarity_cache.clear()
+        lotus.resources.synset_cache.clear()
+        lotus.resources.hypernym_cache.clear()
+
+    def run_similarity():
+        for word1, word2 in SIMILARITY_PAIRS:
+            lotus.semantic_similarity(word1, word2)
+
+    return {
+        "micro.getHomophone": summarize(time_repeats(
+            lambda: [lotus.getHomophone(word) for word in words], repeats), len(words)),
+        "micro.semantic_similarity": summarize(time_repeats(
+            run_similarity, repeats, clear_similarity_caches),
+            len(SIMILARITY_PAIRS)),
+        "micro.find_related_words": summarize(time_repeats(
+            lambda: [lotus.find_related_words(theme) for theme in RELATED_WORD_THEMES],
+            repeats, clear_related_caches), len(RELATED_WORD_THEMES)),
+        "micro.create_verb_phrase": summarize(time_repeats(
+            lambda: [grammar._create_verb_phrase(word) for word in VERB_PHRASE_WORDS],
+            repeats, clear_grammar_caches), len(VERB_PHRASE_WORDS)),
+    }
+
+
+def run_benchmarks(repeats=5, cold_repeats=3, theme_count=20):
+    """Run the whole suite and return the results document."""
+    import nltk
+    import lexicon
+    from schemata import Lotus
+
+    results = {}
+    if cold_repeats:
+        results["startup.cold_lotus"] = summarize(bench_cold_startup(cold_repeats))
+
+    lotus = Lotus(generate=False)
+    warm_up, *themes = theme_sample(theme_count + 1)
+    # The first request pays for lazy corpus loading; startup covers that.
+    # Its theme is left out of the timed sample, which would mostly hit caches
+    lotus.generate_themed_pun(warm_up)
+    latencies = bench_warm_themes(lotus, themes)
+    results["themes.warm_latency"] = summarize(list(latencies.values()))
+    results["themes.warm_latency"]["themes"] = latencies
+
+    results.update(bench_micro(lotus, repeats))
+    return {
+        "format": BENCHMARK_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "nltk": nltk.__version__,
+            "lexicon": lexicon.lexicon_version(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare two results documents benchmark by benchmark.
+
+    Returns (name, baseline median, current median, ratio, regressed) rows
+    for every benchmark present in both.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        rows.append((name, base["median"], result["median"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def format_comparison(rows):
+    """Return the comparison rows as a text table."""
+    header = f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'ratio':>9}"
+    lines = [header, "-" * len(header)]
+    for name, base, current, ratio, regressed in rows:
+        flag = "  SLOWER" if regressed else ""
+        lines.append(f"{name:<28}{base * 1000:>10.1f}ms{current * 1000:>10.1f}ms{ratio:>8.2f}x{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Run the benchmarks, save the results and compare them to a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark pun generation throughput and latency.")
+    parser.add_argument("--output", metavar="PATH", help="write the results JSON here")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown before failing (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="repeats per micro-benchmark (default: 5)")
+    parser.add_argument("--cold-repeats", type=int, default=3,
+                        help="fresh interpreters started for the startup benchmark (default: 3)")
+    parser.add_argument("--themes", type=int, default=20,
+                        help="number of sampled themes timed warm (default: 20)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.repeats, args.cold_repeats, args.themes)
+    for name, result in report["results"].items():
+        print(f"{name:<28}median {result['median'] * 1000:>10.1f}ms"
+              f"   per call {result['per_call'] * 1000:>10.3f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("format") != BENCHMARK_FORMAT:
+            print(f"\nBaseline {args.baseline} uses another benchmark format; not comparing")
+            return 1
+        rows = compare(report, baseline, args.tolerance)
+        print("\n" + format_comparison(rows))
+        if any(row[4] for row in rows):
+            print(f"\nSlower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
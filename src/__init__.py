@@ -15,12 +15,27 @@ __version__ = "1.0.0"
 __author__ = "CS372 Student"
 __email__ = "student@university.edu"
 
-from .schemata import Lotus
-from .templates import GrammaticalTemplate
-from .generate_dataset import PunDatasetGenerator
+import importlib
+
+# Public name -> submodule defining it; submodules are imported on first access
+_exports = {
+    "Lotus": "schemata",
+    "GrammaticalTemplate": "templates",
+    "PunDatasetGenerator": "generate_dataset",
+}
 
 __all__ = [
     "Lotus",
     "GrammaticalTemplate", 
     "PunDatasetGenerator"
-] 
\ No newline at end of file
+] 
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
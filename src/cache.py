@@ -0,0 +1,186 @@
+"""
+Caching utilities for the Pun Generator.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by LRUCache.get when a key is absent and no default is given
+_MISSING = object()
+# Bump whenever the cached pun layout or generation logic changes
+THEME_CACHE_FORMAT = 4
+# Default lifetime of a cached theme, in seconds
+THEME_CACHE_TTL = 7 * 24 * 60 * 60
+# Default number of themes kept on disk
+THEME_CACHE_SIZE = 100000
+
+
+class LRUCache:
+    """Size-bounded least-recently-used cache with hit, miss and eviction counters.
+
+    All operations take an internal lock, so one cache can be shared between
+    threads. A maxsize of None disables eviction.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, marking it as recently used."""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+
+    def items(self):
+        """Return a snapshot of the (key, value) pairs, least recently used first."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return the current size and counters as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ThemeCache:
+    """Persistent theme -> candidate puns cache backed by SQLite.
+
+    Entries are keyed on the normalized theme and a lexicon version string,
+    so results computed from different corpus data are never served, and
+    processes on different versions can share one file. Entries expire after
+    ttl seconds, and the oldest of any version are evicted beyond
+    max_entries. Themes with no pun are cached too, as an empty list.
+    """
+
+    def __init__(self, path, version, ttl=THEME_CACHE_TTL, max_entries=THEME_CACHE_SIZE):
+        if version is None:
+            raise ValueError("a theme cache needs the version of the lexical resources it serves")
+        self.path = path
+        self.version = f"{THEME_CACHE_FORMAT}:{version}"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Several worker processes may share one file, so wait on their locks
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS theme_puns ("
+                " theme TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " puns TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " PRIMARY KEY (theme, version))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS theme_puns_created ON theme_puns (created)")
+
+    @staticmethod
+    def normalize(theme):
+        """Return the cache key for a theme word."""
+        return " ".join(theme.split()).lower()
+
+    def get(self, theme):
+        """Return the cached list of pun dicts for theme, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT puns, created FROM theme_puns WHERE theme = ? AND version = ?",
+                (self.normalize(theme), self.version),
+            ).fetchone()
+            if row is None or row[1] + self.ttl <= time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, theme, puns):
+        """Store the list of pun dicts generated for theme."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO theme_puns (theme, version, puns, created) VALUES (?, ?, ?, ?)",
+                (self.normalize(theme), self.version, json.dumps(puns, ensure_ascii=False), now),
+            )
+            # Entries of other versions may belong to other processes, so they
+            # only go once expired or crowded out
+            evicted = self._conn.execute(
+                "DELETE FROM theme_puns WHERE created <= ?", (now - self.ttl,)).rowcount
+            evicted += self._conn.execute(
+                "DELETE FROM theme_puns WHERE rowid IN ("
+                " SELECT rowid FROM theme_puns ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.evictions += evicted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM theme_puns").fetchone()[0]
+
+    def stats(self):
+        """Return the current size and counters as a dict."""
+        size = len(self)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "maxsize": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
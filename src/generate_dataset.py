@@ -4,83 +4,209 @@ Dataset Generator for Pun Generator
 Generates a dataset of 100 theme words with their corresponding puns.
 """
 
+import os
 import sys
-import io
 import csv
 import json
-from contextlib import redirect_stdout
+import argparse
+import itertools
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
 from schemata import Lotus
-import templates as tmp
+from cache import ThemeCache
+from instrumentation import Instrumentation
+import lexicon
+
+class StreamingDatasetWriter:
+    """Append-only JSONL checkpoint of per-theme results.
+    
+    Each result is written and flushed as soon as its theme completes, with
+    the theme's position in the input list, so an interrupted run loses at
+    most the theme in flight and a rerun can skip everything already done.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        # input position -> theme word for every recorded result
+        self.completed = {}
+        # input position -> whether a pun was found, for resumed totals
+        self.succeeded = {}
+        self._file = None
+        self._load()
+    
+    def _load(self):
+        """Read the existing checkpoint, dropping a partial last line left by a crash."""
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.completed[record['index']] = record['theme_word']
+                # Records written before the flag existed carry only question and answer
+                self.succeeded[record['index']] = record.get(
+                    'success', bool(record['question'] and record['answer']))
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+    
+    def is_done(self, index, theme_word):
+        """Return True if the theme at this input position is already recorded."""
+        return self.completed.get(index) == theme_word
+    
+    def write(self, index, theme_word, question, answer):
+        """Append one result; failed themes are recorded with a null question and answer."""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        success = bool(question and answer)
+        record = {'index': index, 'theme_word': theme_word, 'question': question, 'answer': answer,
+                  'success': success}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed[index] = theme_word
+        self.succeeded[index] = success
+    
+    def close(self):
+        """Close the checkpoint file if it is open."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def entries(self, theme_words=None):
+        """Yield the successful dataset entries recorded so far, one at a time, in input order.
+        
+        Only the last record per input position counts, and with theme_words
+        only where it is still that position's theme, so records left by an
+        earlier run over a different theme list are not yielded.
+        """
+        if not os.path.exists(self.path):
+            return
+        # Byte offset of the last record per position; records are re-read one at a time
+        offsets = {}
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                offsets[json.loads(line)['index']] = offset
+                offset += len(line)
+            for index in sorted(offsets):
+                f.seek(offsets[index])
+                record = json.loads(f.readline())
+                if theme_words is not None and (index >= len(theme_words)
+                                                or theme_words[index] != record['theme_word']):
+                    continue
+                if record['question'] and record['answer']:
+                    yield {
+                        'theme_word': record['theme_word'],
+                        'question': record['question'],
+                        'answer': record['answer']
+                    }
 
 class PunDatasetGenerator:
-    def __init__(self):
+    def __init__(self, resources=None, stream_path=None, theme_cache_path=None, profile=False):
+        # Lexical resources shared by every theme; loaded on first use if not given
+        self.resources = resources
+        # Optional on-disk theme -> puns cache shared across runs and workers
+        self.theme_cache_path = theme_cache_path
+        # Per-theme stage timings, summarized at the end of a run when profiling
+        self.instrumentation = Instrumentation() if profile else None
+        # When streaming, results go to a JSONL checkpoint instead of memory
+        self.stream = StreamingDatasetWriter(stream_path) if stream_path else None
+        self._lotus = None
+        # Themes of the last generate_dataset run, which save_dataset writes out
+        self.theme_words = None
         self.dataset = []
         self.successful_puns = 0
         self.failed_themes = []
         
+    def _get_lotus(self):
+        """Return the generator's Lotus, created once and reused for every theme."""
+        if self._lotus is None:
+            self._lotus = Lotus(resources=self.resources, generate=False,
+                                instrumentation=self.instrumentation)
+            if self.theme_cache_path:
+                # Keyed on the resources generating, which may not be the global snapshot's
+                self._lotus.theme_cache = ThemeCache(self.theme_cache_path,
+                                                     self._lotus.resources.version)
+        return self._lotus
+    
+    def generate_pun(self, theme_word):
+        """Generate the structured Pun for a theme word, or None if none is found."""
+        return self._get_lotus().generate_themed_pun(theme_word)
+    
     def capture_pun_output(self, theme_word):
-        """Capture the pun output for a given theme word."""
-        # Redirect stdout to capture the print output
-        captured_output = io.StringIO()
-        
+        """Return the (question, answer) pun for a theme word, or (None, None)."""
         try:
-            with redirect_stdout(captured_output):
-                # Create Lotus instance with theme word
-                lotus = Lotus(theme_word)
-                
-            # Get the captured output
-            output = captured_output.getvalue().strip()
-            
-            if output and "What do you call" in output:
-                # Parse the output to extract question and answer
-                lines = [line.strip() for line in output.split('\n') if line.strip()]
-                
-                question = None
-                answer = None
-                
-                for i, line in enumerate(lines):
-                    # Find the question line
-                    if "What do you call" in line and line.endswith("?"):
-                        question = line
-                        
-                        # Look for the answer after the countdown
-                        # The answer typically starts with "A " and ends with "!"
-                        for j in range(i + 1, len(lines)):
-                            if lines[j].startswith("A ") and lines[j].endswith("!"):
-                                answer = lines[j][2:-1]  # Remove "A " and "!"
-                                break
-                        break
-                
-                if question and answer:
-                    return question, answer
-                        
-            return None, None
-            
+            pun = self.generate_pun(theme_word)
         except Exception as e:
             print(f"Error generating pun for '{theme_word}': {str(e)}")
             return None, None
+        
+        if pun is None:
+            return None, None
+        return pun.question, pun.answer
     
-    def generate_dataset(self, theme_words):
-        """Generate dataset for the given theme words."""
+    def generate_dataset(self, theme_words, workers=1):
+        """Generate dataset for the given theme words.
+        
+        With workers > 1 the themes are spread across a process pool; results
+        are still recorded in input order. When streaming, themes already in
+        the checkpoint are skipped.
+        """
         print(f"Generating puns for {len(theme_words)} theme words...")
         print("=" * 60)
+        self.theme_words = list(theme_words)
         
-        for i, theme_word in enumerate(theme_words, 1):
-            print(f"\n[{i}/{len(theme_words)}] Processing theme: '{theme_word}'")
-            
-            question, answer = self.capture_pun_output(theme_word)
-            
-            if question and answer:
-                self.dataset.append({
-                    'theme_word': theme_word,
-                    'question': question,
-                    'answer': answer
-                })
-                self.successful_puns += 1
-                print(f"✓ Success: {question} → {answer}")
-            else:
-                self.failed_themes.append(theme_word)
-                print(f"✗ Failed to generate pun for '{theme_word}'")
+        pending = list(enumerate(theme_words))
+        if self.stream is not None:
+            pending = []
+            for index, theme_word in enumerate(theme_words):
+                if not self.stream.is_done(index, theme_word):
+                    pending.append((index, theme_word))
+                # Themes recorded by an earlier run still count towards the totals
+                elif self.stream.succeeded[index]:
+                    self.successful_puns += 1
+                else:
+                    self.failed_themes.append(theme_word)
+            skipped = len(theme_words) - len(pending)
+            if skipped:
+                print(f"Resuming: skipping {skipped} themes already recorded in {self.stream.path}")
+        pending_words = [theme_word for _, theme_word in pending]
+        
+        if workers > 1:
+            results = self._generate_parallel(pending_words, workers)
+        else:
+            results = (self.capture_pun_output(theme_word) for theme_word in pending_words)
+        
+        try:
+            for index, theme_word in pending:
+                print(f"\n[{index + 1}/{len(theme_words)}] Processing theme: '{theme_word}'")
+                
+                question, answer = next(results)
+                if self.stream is not None:
+                    self.stream.write(index, theme_word, question, answer)
+                
+                if question and answer:
+                    if self.stream is None:
+                        self.dataset.append({
+                            'theme_word': theme_word,
+                            'question': question,
+                            'answer': answer
+                        })
+                    self.successful_puns += 1
+                    print(f"✓ Success: {question} → {answer}")
+                else:
+                    self.failed_themes.append(theme_word)
+                    print(f"✗ Failed to generate pun for '{theme_word}'")
+        finally:
+            if self.stream is not None:
+                self.stream.close()
         
         print(f"\n" + "=" * 60)
         print(f"Dataset generation complete!")
@@ -89,42 +215,99 @@ class PunDatasetGenerator:
         
         if self.failed_themes:
             print(f"Failed themes: {', '.join(self.failed_themes)}")
+        
+        if self.instrumentation is not None and self.instrumentation.requests:
+            print(f"\nLatency percentiles over {len(self.instrumentation.requests)} themes:")
+            print(self.instrumentation.format_percentiles())
+    
+    def _generate_parallel(self, theme_words, workers):
+        """Yield (question, answer) per theme, in input order, from a process pool."""
+        profile = self.instrumentation is not None
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.theme_cache_path, profile)) as executor:
+            futures = [executor.submit(_generate_in_worker, theme_word) for theme_word in theme_words]
+            for theme_word, future in zip(theme_words, futures):
+                try:
+                    question, answer, record = future.result()
+                    # Worker timings are merged so percentiles cover the whole run
+                    if record is not None:
+                        self.instrumentation.add_request(record)
+                    yield question, answer
+                except Exception as e:
+                    # A crashed worker only fails its own themes
+                    print(f"Error generating pun for '{theme_word}': {str(e)}")
+                    yield None, None
     
     def save_dataset(self, filename_base="pun_dataset"):
-        """Save the dataset in multiple formats."""
-        if not self.dataset:
+        """Save the dataset in multiple formats.
+        
+        When streaming, entries for the themes of the last run are read back
+        from the checkpoint one at a time rather than held in memory.
+        """
+        entries = iter(self.stream.entries(self.theme_words) if self.stream is not None
+                       else self.dataset)
+        first = next(entries, None)
+        if first is None:
             print("No data to save!")
             return
+        entries = itertools.chain([first], entries)
         
-        # Save as CSV
         csv_filename = f"{filename_base}.csv"
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        json_filename = f"{filename_base}.json"
+        txt_filename = f"{filename_base}.txt"
+        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile, \
+                open(json_filename, 'w', encoding='utf-8') as jsonfile, \
+                open(txt_filename, 'w', encoding='utf-8') as txtfile:
+            # CSV
             fieldnames = ['theme_word', 'question', 'answer']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
-            writer.writerows(self.dataset)
-        
-        # Save as JSON
-        json_filename = f"{filename_base}.json"
-        with open(json_filename, 'w', encoding='utf-8') as jsonfile:
-            json.dump(self.dataset, jsonfile, indent=2, ensure_ascii=False)
-        
-        # Save as text file for easy reading
-        txt_filename = f"{filename_base}.txt"
-        with open(txt_filename, 'w', encoding='utf-8') as txtfile:
+            
+            # JSON, written element by element in json.dump(indent=2) layout
+            jsonfile.write("[\n")
+            
+            # Text file for easy reading
             txtfile.write("PUN GENERATOR DATASET\n")
             txtfile.write("=" * 50 + "\n\n")
             
-            for i, entry in enumerate(self.dataset, 1):
+            for i, entry in enumerate(entries, 1):
+                writer.writerow(entry)
+                
+                if i > 1:
+                    jsonfile.write(",\n")
+                jsonfile.write(textwrap.indent(json.dumps(entry, indent=2, ensure_ascii=False), "  "))
+                
                 txtfile.write(f"{i}. Theme: {entry['theme_word']}\n")
                 txtfile.write(f"   Q: {entry['question']}\n")
                 txtfile.write(f"   A: {entry['answer']}\n\n")
+            
+            jsonfile.write("\n]")
         
         print(f"\nDataset saved in multiple formats:")
         print(f"  - CSV: {csv_filename}")
         print(f"  - JSON: {json_filename}")
         print(f"  - Text: {txt_filename}")
 
+# Per-process generator used by pool workers
+_worker_generator = None
+
+def _init_worker(theme_cache_path=None, profile=False):
+    """Load the lexicon once when a pool worker starts."""
+    global _worker_generator
+    _worker_generator = PunDatasetGenerator(resources=lexicon.get_shared_resources(),
+                                            theme_cache_path=theme_cache_path, profile=profile)
+
+def _generate_in_worker(theme_word):
+    """Generate the pun for one theme inside a pool worker.
+    
+    Returns (question, answer, timing record); the record is None unless
+    profiling.
+    """
+    question, answer = _worker_generator.capture_pun_output(theme_word)
+    instrumentation = _worker_generator.instrumentation
+    record = instrumentation.last_request if instrumentation is not None else None
+    return question, answer, record
+
 def get_expanded_theme_words():
     """Return a list of diverse theme words for pun generation."""
     return [
@@ -211,6 +394,17 @@ def get_expanded_theme_words():
 
 def main():
     """Main function to generate the expanded pun dataset."""
+    parser = argparse.ArgumentParser(description="Generate the expanded pun dataset.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--stream", metavar="PATH",
+                        help="append results to this JSONL checkpoint and resume from it on rerun")
+    parser.add_argument("--theme-cache", metavar="PATH",
+                        help="SQLite file caching puns per theme across runs")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each pipeline stage and print latency percentiles")
+    args = parser.parse_args()
+    
     print("PUN GENERATOR EXPANDED DATASET CREATION")
     print("=" * 50)
     
@@ -219,10 +413,11 @@ def main():
     print(f"Total theme words: {len(theme_words)}")
     
     # Create dataset generator
-    generator = PunDatasetGenerator()
+    generator = PunDatasetGenerator(stream_path=args.stream, theme_cache_path=args.theme_cache,
+                                    profile=args.profile)
     
     # Generate the dataset
-    generator.generate_dataset(theme_words)
+    generator.generate_dataset(theme_words, workers=args.workers)
     
     # Save the dataset
     generator.save_dataset("pun_dataset_expanded")
@@ -0,0 +1,180 @@
+"""
+Opt-in timing instrumentation for the Pun Generator pipeline.
+
+An Instrumentation object records wall time and call counts per pipeline
+stage, plus cache hit rates, for every request made through a Lotus it is
+attached to. Results can be read as a dict, a JSON line or Prometheus text,
+and summarized as latency percentiles across requests.
+"""
+
+import json
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Default number of per-request records kept for percentiles
+MAX_RECORDED_REQUESTS = 10000
+# Percentiles reported by Instrumentation.percentiles
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, q):
+    """Return the q-th percentile of values by the nearest-rank method."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Instrumentation:
+    """Per-stage timers, call counters and cache hit rates for Lotus requests.
+
+    Stage timings always feed the running totals; those taken while a
+    request is open are also kept in that request's record. One instance
+    is meant to be used from a single thread.
+    """
+
+    def __init__(self, max_requests=MAX_RECORDED_REQUESTS):
+        # stage -> [calls, seconds], across every request
+        self.stage_totals = {}
+        # cache -> [hits, misses], across every request
+        self.cache_totals = {}
+        self.request_count = 0
+        self.request_seconds = 0.0
+        self.requests = deque(maxlen=max_requests)
+        self._current = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of the named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, 1, time.perf_counter() - start)
+
+    def _add(self, name, calls, seconds):
+        totals = self.stage_totals.setdefault(name, [0, 0.0])
+        totals[0] += calls
+        totals[1] += seconds
+        if self._current is not None:
+            stages = self._current["stages"].setdefault(name, {"calls": 0, "seconds": 0.0})
+            stages["calls"] += calls
+            stages["seconds"] += seconds
+
+    @contextmanager
+    def request(self, label=None, cache_stats=None):
+        """Record the enclosed block as one request.
+
+        cache_stats is a callable returning {cache: {"hits", "misses", ...}};
+        it is sampled before and after so the record holds this request's
+        own hit rates.
+        """
+        before = cache_stats() if cache_stats else {}
+        self._current = {"label": label, "stages": {}, "caches": {}}
+        start = time.perf_counter()
+        try:
+            yield self._current
+        finally:
+            record, self._current = self._current, None
+            record["seconds"] = time.perf_counter() - start
+            after = cache_stats() if cache_stats else {}
+            for name, stats in after.items():
+                hits = stats["hits"] - before.get(name, {}).get("hits", 0)
+                misses = stats["misses"] - before.get(name, {}).get("misses", 0)
+                record["caches"][name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                }
+            self.add_request(record, count_stages=False)
+
+    def add_request(self, record, count_stages=True):
+        """Add a finished request record, e.g. one returned by a worker process."""
+        self.requests.append(record)
+        self.request_count += 1
+        self.request_seconds += record["seconds"]
+        for name, stats in record["caches"].items():
+            totals = self.cache_totals.setdefault(name, [0, 0])
+            totals[0] += stats["hits"]
+            totals[1] += stats["misses"]
+        if count_stages:
+            for name, stats in record["stages"].items():
+                totals = self.stage_totals.setdefault(name, [0, 0.0])
+                totals[0] += stats["calls"]
+                totals[1] += stats["seconds"]
+
+    @property
+    def last_request(self):
+        """The most recently finished request record, or None."""
+        return self.requests[-1] if self.requests else None
+
+    def to_dict(self):
+        """Return the running totals as a plain dict."""
+        return {
+            "requests": self.request_count,
+            "seconds": self.request_seconds,
+            "stages": {name: {"calls": calls, "seconds": seconds}
+                       for name, (calls, seconds) in self.stage_totals.items()},
+            "caches": {name: {"hits": hits, "misses": misses,
+                              "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+                       for name, (hits, misses) in self.cache_totals.items()},
+        }
+
+    def to_json_line(self, record=None):
+        """Return one request record (the last by default) as a single JSON line."""
+        if record is None:
+            record = self.last_request
+        return json.dumps(record, ensure_ascii=False, sort_keys=True)
+
+    def to_prometheus(self, prefix="pun"):
+        """Return the running totals in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_requests_total Requests handled.",
+            f"# TYPE {prefix}_requests_total counter",
+            f"{prefix}_requests_total {self.request_count}",
+            f"# HELP {prefix}_request_seconds_total Wall time spent handling requests.",
+            f"# TYPE {prefix}_request_seconds_total counter",
+            f"{prefix}_request_seconds_total {self.request_seconds!r}",
+            f"# HELP {prefix}_stage_calls_total Calls of each pipeline stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}'
+                  for name, (calls, _) in sorted(self.stage_totals.items())]
+        lines += [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds!r}'
+                  for name, (_, seconds) in sorted(self.stage_totals.items())]
+        for kind, column in (("hits", 0), ("misses", 1)):
+            lines += [
+                f"# HELP {prefix}_cache_{kind}_total Cache {kind} during requests.",
+                f"# TYPE {prefix}_cache_{kind}_total counter",
+            ]
+            lines += [f'{prefix}_cache_{kind}_total{{cache="{name}"}} {totals[column]}'
+                      for name, totals in sorted(self.cache_totals.items())]
+        return "\n".join(lines) + "\n"
+
+    def percentiles(self, qs=DEFAULT_PERCENTILES):
+        """Return request and per-stage latency percentiles, in seconds.
+
+        Stage percentiles are taken over the requests that ran the stage.
+        """
+        samples = {"request": [record["seconds"] for record in self.requests]}
+        for record in self.requests:
+            for name, stats in record["stages"].items():
+                samples.setdefault(name, []).append(stats["seconds"])
+        return {name: {f"p{q}": percentile(values, q) for q in qs}
+                for name, values in samples.items()}
+
+    def format_percentiles(self, qs=DEFAULT_PERCENTILES):
+        """Return the percentiles as a text table in milliseconds."""
+        header = f"{'stage':<20}" + "".join(f"{'p' + str(q):>12}" for q in qs)
+        lines = [header, "-" * len(header)]
+        for name, values in self.percentiles(qs).items():
+            lines.append(f"{name:<20}" + "".join(f"{values['p' + str(q)] * 1000:>10.1f}ms"
+                                                  for q in qs))
+        return "\n".join(lines)
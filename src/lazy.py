@@ -0,0 +1,42 @@
+"""
+Deferred imports for the Pun Generator.
+
+Importing anything from NLTK imports the whole nltk package, which takes
+longer than the rest of start-up combined. Modules bind the NLTK objects they
+use to LazyImport stand-ins instead, so the import only happens once one of
+them is actually used.
+"""
+
+import importlib
+
+
+class LazyImport:
+    """Stand-in for a module, or an attribute of one, imported on first use.
+
+        wn = LazyImport("nltk.corpus", "wordnet")
+        wn.synsets("dog")  # nltk.corpus is imported here
+    """
+
+    def __init__(self, module, attribute=None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            if self._attribute is not None:
+                target = getattr(target, self._attribute)
+            self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        name = f"{self._module}.{self._attribute}" if self._attribute else self._module
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyImport {name} ({state})>"
@@ -0,0 +1,1066 @@
+"""
+Shared lexical resources for the Pun Generator.
+
+Holds lookup structures that are expensive to derive from the NLTK corpora
+and are therefore built once per process instead of once per call. The
+corpus data, and the pun table derived from it, can also be persisted as an
+on-disk snapshot, next to a compiled verb lexicon for the grammar layer and a
+memory-mapped word frequency table:
+
+    python src/lexicon.py build
+"""
+
+import argparse
+import bisect
+import hashlib
+import math
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+from cache import LRUCache
+from lazy import LazyImport
+
+# Importing NLTK is slow, so wait until a corpus is actually needed
+nltk = LazyImport("nltk")
+brown = LazyImport("nltk.corpus", "brown")
+cmudict = LazyImport("nltk.corpus", "cmudict")
+wn = LazyImport("nltk.corpus", "wordnet")
+
+# Bump whenever the snapshot layout changes
+SNAPSHOT_FORMAT = 5
+# Snapshot location, overridable through the environment
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    "PUN_LEXICON_SNAPSHOT",
+    os.path.join(os.path.expanduser("~"), ".cache", "punbelievable", "lexicon.pickle"),
+)
+# NLTK resources the snapshot and the results generated from it depend on;
+# word frequencies are fingerprinted separately with the frequency table
+SNAPSHOT_CORPORA = ("corpora/wordnet", "corpora/cmudict")
+# Bump whenever the verb lexicon layout changes
+VERB_LEXICON_FORMAT = 1
+# Verb lexicon location, overridable through the environment
+DEFAULT_VERB_LEXICON_PATH = os.environ.get(
+    "PUN_VERB_LEXICON",
+    os.path.join(os.path.expanduser("~"), ".cache", "punbelievable", "verbs.pickle"),
+)
+# The verb lexicon only depends on WordNet
+VERB_LEXICON_CORPORA = ("corpora/wordnet",)
+# Bump whenever the frequency table file layout changes
+FREQUENCY_TABLE_FORMAT = 2
+# Frequency table location, overridable through the environment
+DEFAULT_FREQUENCY_TABLE_PATH = os.environ.get(
+    "PUN_FREQUENCY_TABLE",
+    os.path.join(os.path.expanduser("~"), ".cache", "punbelievable", "frequencies.bin"),
+)
+# Word counts the frequency table is compiled from: "brown", or
+# "text:PATH" / "counts:PATH" for a local corpus or a counts file
+DEFAULT_FREQUENCY_SOURCE = os.environ.get("PUN_FREQUENCY_SOURCE", "brown")
+# A Brown frequency table only depends on the Brown corpus
+FREQUENCY_TABLE_CORPORA = ("corpora/brown",)
+# How word information content is precomputed: from the word's own count,
+# or Resnik-style from the counts its first noun sense subsumes
+WORD_IC = "word"
+SYNSET_IC = "synset"
+IC_MODES = (WORD_IC, SYNSET_IC)
+# Frequency table header: magic, format, word count, total count, the
+# information content of unseen words, source fingerprint, the byte order
+# of the arrays that follow and the IC mode
+FREQUENCY_TABLE_MAGIC = b"PUNFREQ\0"
+FREQUENCY_TABLE_HEADER = struct.Struct("<8sIIQd40s1s1s6x")
+# Default bounds for the shared memo caches
+SIMILARITY_CACHE_SIZE = 200000
+SYNSET_CACHE_SIZE = 50000
+# Noun senses per word whose hypernyms are compared by the similarity score
+HYPERNYM_SENSES = 2
+
+
+class PhoneticIndex:
+    """Inverted index over the CMU Pronouncing Dictionary.
+
+    Maps every word to its pronunciations and every pronunciation back to
+    the words that share it, so homophone lookup is a dictionary hit instead
+    of a scan over the whole dictionary.
+    """
+
+    def __init__(self, pronunciations):
+        self.word_to_prons = {}
+        self.pron_to_words = {}
+        # Dictionary order of each word, used to keep results deterministic
+        self._rank = {}
+
+        for rank, (word, prons) in enumerate(pronunciations.items()):
+            self._rank[word] = rank
+            keys = tuple(tuple(pron) for pron in prons)
+            self.word_to_prons[word] = keys
+            for pron in keys:
+                self.pron_to_words.setdefault(pron, []).append(word)
+
+    def __contains__(self, word):
+        return word in self.word_to_prons
+
+    def __len__(self):
+        return len(self.word_to_prons)
+
+    def homophones(self, word):
+        """Return every homophone of word in dictionary order."""
+        found = set()
+        for pron in self.word_to_prons.get(word, ()):
+            found.update(self.pron_to_words[pron])
+        found.discard(word)
+        return sorted(found, key=self._rank.__getitem__)
+
+    def first_homophone(self, word):
+        """Return the first homophone of word in dictionary order, or None."""
+        best = None
+        for pron in self.word_to_prons.get(word, ()):
+            for candidate in self.pron_to_words[pron]:
+                if candidate == word:
+                    continue
+                # Posting lists are already in dictionary order
+                if best is None or self._rank[candidate] < self._rank[best]:
+                    best = candidate
+                break
+        return best
+
+
+class VerbLexicon:
+    """Precompiled WordNet tables for the grammar layer.
+
+    Holds the parts of speech of every WordNet lemma together with morphy's
+    exception lists and suffix rules, so verb checks and lemmatization give
+    exactly WordNet's answers without loading the corpus. Also maps lemma
+    names to the verb found through their derivationally related forms.
+    """
+
+    def __init__(self, lemma_pos, exceptions, substitutions, derived_verbs):
+        # lemma -> string of the WordNet POS codes it has, e.g. "nv"
+        self.lemma_pos = lemma_pos
+        # pos -> {inflected form: base forms}
+        self.exceptions = exceptions
+        # pos -> ((suffix, replacement), ...) in morphy's order
+        self.substitutions = substitutions
+        # lemma -> derived verb, for the lemmas that have one
+        self.derived_verbs = derived_verbs
+
+    def __contains__(self, lemma):
+        return lemma in self.lemma_pos
+
+    def morphy(self, form, pos):
+        """Return the lemmas WordNet's _morphy finds for form, in the same order."""
+        exceptions = self.exceptions.get(pos, {})
+        if form in exceptions:
+            candidates = exceptions[form]
+        else:
+            candidates = [form[:-len(old)] + new for old, new in self.substitutions.get(pos, ())
+                          if form.endswith(old)]
+        found = []
+        for candidate in [form, *candidates]:
+            if pos in self.lemma_pos.get(candidate, "") and candidate not in found:
+                found.append(candidate)
+        return found
+
+    def is_verb(self, word):
+        """Return True if wn.synsets(word, pos=wn.VERB) is non-empty."""
+        return bool(self.morphy(word.lower(), "v"))
+
+    def lemmatize(self, word, pos):
+        """Return what WordNetLemmatizer().lemmatize(word, pos) would."""
+        lemmas = self.morphy(word, pos)
+        return min(lemmas, key=len) if lemmas else word
+
+    def derived_verb(self, lemma):
+        """Return the verb derived from a WordNet lemma name, or None."""
+        return self.derived_verbs.get(lemma)
+
+
+class Compound:
+    """Read-only view of one row of a CompoundTable."""
+
+    __slots__ = ("table", "position")
+
+    def __init__(self, table, position):
+        self.table = table
+        self.position = position
+
+    @property
+    def name(self):
+        """The compound as listed, e.g. "serial_killer"."""
+        return self.table.names[self.position]
+
+    @property
+    def modifier_id(self):
+        return self.table.modifiers[self.position]
+
+    @property
+    def head_id(self):
+        return self.table.heads[self.position]
+
+    @property
+    def modifier(self):
+        """The lower-cased first lexeme, e.g. "serial"."""
+        return self.table.lexemes[self.modifier_id]
+
+    @property
+    def head(self):
+        """The lower-cased second lexeme, e.g. "killer"."""
+        return self.table.lexemes[self.head_id]
+
+    def __repr__(self):
+        return f"<Compound {self.position} {self.name!r}>"
+
+
+class CompoundTable:
+    """Two-part compound nouns as integer lexeme IDs.
+
+    Each distinct lower-cased lexeme is stored once, in sorted order, and
+    compound i is the pair (modifiers[i], heads[i]) of IDs into lexemes.
+    The compounds holding lexeme ID j are
+    postings[posting_starts[j]:posting_starts[j + 1]], in list order.
+    """
+
+    def __init__(self, names):
+        # The compound list itself is shared, not copied
+        self.names = names
+        split = [name.lower().partition('_')[::2] for name in names]
+        self.lexemes = sorted({sys.intern(lexeme) for pair in split for lexeme in pair})
+        ids = {lexeme: lexeme_id for lexeme_id, lexeme in enumerate(self.lexemes)}
+        self.modifiers = array('I', [ids[modifier] for modifier, _ in split])
+        self.heads = array('I', [ids[head] for _, head in split])
+
+        # Counting sort of the positions by lexeme, skipping repeats within a compound
+        counts = [0] * (len(self.lexemes) + 1)
+        for modifier, head in zip(self.modifiers, self.heads):
+            counts[modifier + 1] += 1
+            if head != modifier:
+                counts[head + 1] += 1
+        for lexeme_id in range(len(self.lexemes)):
+            counts[lexeme_id + 1] += counts[lexeme_id]
+        self.posting_starts = array('I', counts)
+        self.postings = array('I', [0]) * counts[-1]
+        for position, (modifier, head) in enumerate(zip(self.modifiers, self.heads)):
+            for lexeme_id in ((modifier,) if head == modifier else (modifier, head)):
+                self.postings[counts[lexeme_id]] = position
+                counts[lexeme_id] += 1
+
+    def __len__(self):
+        return len(self.modifiers)
+
+    def __getitem__(self, position):
+        if not -len(self) <= position < len(self):
+            raise IndexError("compound position out of range")
+        return Compound(self, position % len(self))
+
+    def lexeme_id(self, lexeme):
+        """Return the ID of a lower-cased lexeme, or None if no compound has it."""
+        lexeme_id = bisect.bisect_left(self.lexemes, lexeme)
+        if lexeme_id < len(self.lexemes) and self.lexemes[lexeme_id] == lexeme:
+            return lexeme_id
+        return None
+
+    def parts(self, positions):
+        """Yield the (modifier, head) lexemes of the compounds at positions."""
+        lexemes, modifiers, heads = self.lexemes, self.modifiers, self.heads
+        for position in positions:
+            yield lexemes[modifiers[position]], lexemes[heads[position]]
+
+    def positions_containing(self, lexemes):
+        """Return the sorted positions of the compounds with any of the given lexemes."""
+        positions = set()
+        for lexeme in lexemes:
+            lexeme_id = self.lexeme_id(lexeme)
+            if lexeme_id is not None:
+                positions.update(self.postings[self.posting_starts[lexeme_id]:
+                                               self.posting_starts[lexeme_id + 1]])
+        return sorted(positions)
+
+
+class HypernymIndex:
+    """Parents and grandparents of every WordNet noun synset, as integer IDs.
+
+    IDs are synset offsets. The rows are sorted by offset and each level is
+    stored as flat arrays: the parents of the synset in row r are
+    parents[parent_starts[r]:parent_starts[r + 1]], and likewise for
+    grandparents.
+    """
+
+    def __init__(self, offsets, parent_starts, parents, grandparent_starts, grandparents):
+        self.offsets = offsets
+        self.parent_starts = parent_starts
+        self.parents = parents
+        self.grandparent_starts = grandparent_starts
+        self.grandparents = grandparents
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def ancestors(self, offset):
+        """Return (parent IDs, grandparent IDs) of a synset, or None if it is not indexed."""
+        row = bisect.bisect_left(self.offsets, offset)
+        if row == len(self.offsets) or self.offsets[row] != offset:
+            return None
+        return (frozenset(self.parents[self.parent_starts[row]:self.parent_starts[row + 1]]),
+                frozenset(self.grandparents[self.grandparent_starts[row]:
+                                            self.grandparent_starts[row + 1]]))
+
+    def to_arrays(self):
+        """Return the arrays the index is built from, e.g. for a snapshot."""
+        return {
+            "offsets": self.offsets,
+            "parent_starts": self.parent_starts,
+            "parents": self.parents,
+            "grandparent_starts": self.grandparent_starts,
+            "grandparents": self.grandparents,
+        }
+
+
+class FrequencyTable:
+    """Read-only word -> count and information content table over a sorted binary file.
+
+    The file is normally memory-mapped, so every process using it shares
+    the same pages. Provides the parts of FreqDist's interface that
+    information content used to need, get(), N(), len() and membership,
+    plus the precomputed information_content() itself.
+
+    After the header come (size + 1) 'I' offsets into the word blob, size
+    'Q' counts, size 'd' information contents, then the UTF-8 words
+    themselves, sorted bytewise so a word is found by binary search.
+    """
+
+    def __init__(self, data):
+        if len(data) < FREQUENCY_TABLE_HEADER.size:
+            raise ValueError("truncated frequency table")
+        (magic, self.format, self._size, self._total, self._unseen_ic, fingerprint,
+         byteorder, ic_mode) = FREQUENCY_TABLE_HEADER.unpack_from(data)
+        if magic != FREQUENCY_TABLE_MAGIC or byteorder != sys.byteorder[0].encode():
+            raise ValueError("not a frequency table for this platform")
+        self.fingerprint = fingerprint.decode("ascii")
+        self.ic_mode = SYNSET_IC if ic_mode == b"s" else WORD_IC
+
+        offsets_start = FREQUENCY_TABLE_HEADER.size
+        counts_start = offsets_start + 4 * (self._size + 1)
+        ic_start = counts_start + 8 * self._size
+        self._words_start = ic_start + 8 * self._size
+        if len(data) < self._words_start:
+            raise ValueError("truncated frequency table")
+        view = memoryview(data)
+        self._offsets = view[offsets_start:counts_start].cast("I")
+        self._counts = view[counts_start:ic_start].cast("Q")
+        self._ic = view[ic_start:self._words_start].cast("d")
+        if len(data) < self._words_start + self._offsets[-1]:
+            raise ValueError("truncated frequency table")
+        self._data = data
+
+    def _find(self, word):
+        """Return the row of word, or None."""
+        key = word.encode("utf-8")
+        data, offsets, start = self._data, self._offsets, self._words_start
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = data[start + offsets[mid]:start + offsets[mid + 1]]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def get(self, word, default=None):
+        """Return the count of word, or default if it never occurs."""
+        row = self._find(word)
+        return default if row is None else self._counts[row]
+
+    def information_content(self, word):
+        """Return the precomputed information content of a lower-cased word."""
+        row = self._find(word)
+        return self._unseen_ic if row is None else self._ic[row]
+
+    def __getitem__(self, word):
+        return self.get(word, 0)
+
+    def __contains__(self, word):
+        return self._find(word) is not None
+
+    def __len__(self):
+        return self._size
+
+    def N(self):
+        """Return the total count over all words."""
+        return self._total
+
+
+def write_frequency_table(path, counts, fingerprint, information_content=None, ic_mode=WORD_IC):
+    """Write a word -> count mapping to path in FrequencyTable's layout.
+
+    Each word's information content is -log p(word), unless given in the
+    information_content mapping; words only found there get a count of 0.
+    """
+    total = sum(counts.values())
+    information_content = information_content or {}
+    words = set(counts).union(information_content)
+    encoded = sorted((word.encode("utf-8"), word) for word in words)
+    offsets, sizes, ics, blob = array("I", [0]), array("Q"), array("d"), bytearray()
+    for key, word in encoded:
+        blob += key
+        offsets.append(len(blob))
+        count = counts.get(word, 0)
+        sizes.append(count)
+        ic = information_content.get(word)
+        ics.append(ic if ic is not None else -math.log(max(count, 1) / total))
+    header = FREQUENCY_TABLE_HEADER.pack(
+        FREQUENCY_TABLE_MAGIC, FREQUENCY_TABLE_FORMAT, len(encoded), total,
+        -math.log(1 / total) if total else 0.0, fingerprint.encode("ascii"),
+        sys.byteorder[0].encode(), ic_mode[0].encode())
+    with _atomic_open(path) as table_file:
+        table_file.write(header)
+        table_file.write(offsets.tobytes())
+        table_file.write(sizes.tobytes())
+        table_file.write(ics.tobytes())
+        table_file.write(blob)
+
+
+def synset_information_content(counts):
+    """Return Resnik-style information content for words with a noun sense.
+
+    Each word's count is split evenly over its noun senses and credited
+    to every sense and each of its ancestors once, as in Resnik (1995), so
+    a general sense such as animal.n.01 subsumes all of its hyponyms. A
+    word's information content is -log p of its first, most frequent, sense.
+    WordNet nouns never seen in the counts are included when their first
+    sense subsumes something that was.
+    """
+    closures = {}
+
+    def closure(synset):
+        ancestors = closures.get(synset)
+        if ancestors is None:
+            ancestors = frozenset([synset.offset()]).union(
+                *[closure(parent) for parent in synset.hypernyms() + synset.instance_hypernyms()])
+            closures[synset] = ancestors
+        return ancestors
+
+    # Subsumed count per noun synset offset
+    mass = Counter()
+    first_senses = {}
+    total = 0
+    for word, count in counts.items():
+        senses = wn.synsets(word, pos=wn.NOUN)
+        if not senses or not count:
+            continue
+        first_senses[word] = senses[0].offset()
+        total += count
+        share = count / len(senses)
+        for sense in senses:
+            for offset in closure(sense):
+                mass[offset] += share
+
+    # A lemma's senses are listed most frequent first, as wn.synsets returns them
+    for name, offsets in wn._lemma_pos_offset_map.items():
+        if 'n' in offsets and '_' not in name and name not in first_senses:
+            first_senses[name] = offsets['n'][0]
+    information_content = {}
+    for word, offset in first_senses.items():
+        if mass[offset]:
+            information_content[word] = max(0.0, math.log(total / mass[offset]))
+    return information_content
+
+
+def synset_hypernym_ids(synset):
+    """Return (parent IDs, grandparent IDs) of a synset, read from WordNet."""
+    parents = synset.hypernyms()
+    return (frozenset(parent.offset() for parent in parents),
+            frozenset(grandparent.offset() for parent in parents
+                      for grandparent in parent.hypernyms()))
+
+
+class LexicalResources:
+    """Corpus-derived data shared by every Lotus instance in a process.
+
+    Loading this is the expensive part of pun generation, so it is done once
+    and the same object is handed to each Lotus.
+    """
+
+    def __init__(self, compounds, freq_dist, phonetic_index, pun_table=None,
+                 hypernym_index=None, version=None,
+                 similarity_cache_size=SIMILARITY_CACHE_SIZE,
+                 synset_cache_size=SYNSET_CACHE_SIZE):
+        self.compounds = compounds
+        self.freq_dist = freq_dist
+        self.phonetic_index = phonetic_index
+        # compound -> (homophone, hypernym, meronym) for the compounds that
+        # can make a pun; None when not precomputed
+        self.pun_table = pun_table
+        # Noun synset ancestors (HypernymIndex); None reads them from WordNet
+        self.hypernym_index = hypernym_index
+        # data_version() of what these were loaded from, keying persistent
+        # caches; None for resources assembled by hand
+        self.version = version
+        # Memoized word-pair similarity scores, keyed on the unordered pair
+        self.similarity_cache = LRUCache(similarity_cache_size)
+        # Memoized noun synsets per lower-cased word
+        self.synset_cache = LRUCache(synset_cache_size)
+        # Memoized hypernym IDs of the top noun senses per lower-cased word
+        self.hypernym_cache = LRUCache(synset_cache_size)
+        # Memoized related-word expansions, keyed on (word, depth, relations)
+        self.related_cache = LRUCache(synset_cache_size)
+        self._compound_table = None
+        self._lock = threading.Lock()
+
+    @property
+    def compound_table(self):
+        """The compounds as integer lexeme IDs (CompoundTable).
+
+        Built on first use, then shared by every request.
+        """
+        if self._compound_table is None:
+            with self._lock:
+                if self._compound_table is None:
+                    self._compound_table = CompoundTable(self.compounds)
+        return self._compound_table
+
+    def compounds_containing(self, lexemes):
+        """Return the compounds with any of the given lower-cased lexemes, in list order."""
+        positions = self.compound_table.positions_containing(lexemes)
+        return [self.compounds[position] for position in positions]
+
+    def noun_synsets(self, word):
+        """Return the WordNet noun synsets of word, memoized per word."""
+        word = word.lower()
+        synsets = self.synset_cache.get(word)
+        if synsets is None:
+            synsets = tuple(wn.synsets(word, pos=wn.NOUN))
+            self.synset_cache.put(word, synsets)
+        return synsets
+
+    def hypernym_ids(self, word):
+        """Return (parent IDs, grandparent IDs) for each top noun sense of word, memoized."""
+        word = word.lower()
+        senses = self.hypernym_cache.get(word)
+        if senses is None:
+            senses = []
+            for synset in self.noun_synsets(word)[:HYPERNYM_SENSES]:
+                ancestors = None
+                if self.hypernym_index is not None:
+                    ancestors = self.hypernym_index.ancestors(synset.offset())
+                senses.append(ancestors or synset_hypernym_ids(synset))
+            senses = tuple(senses)
+            self.hypernym_cache.put(word, senses)
+        return senses
+
+    def information_content(self, word):
+        """Return the information content of a lower-cased word, or None without frequencies.
+
+        A frequency table has it precomputed; live counts give -log p(word).
+        """
+        if not self.freq_dist:
+            return None
+        precomputed = getattr(self.freq_dist, "information_content", None)
+        if precomputed is not None:
+            return precomputed(word)
+        return -math.log(self.freq_dist.get(word, 1) / self.freq_dist.N())
+
+    def cache_stats(self):
+        """Return hit, miss and eviction counters for the shared caches."""
+        return {
+            "similarity": self.similarity_cache.stats(),
+            "synsets": self.synset_cache.stats(),
+            "hypernyms": self.hypernym_cache.stats(),
+            "related_words": self.related_cache.stats(),
+        }
+
+    @classmethod
+    def load(cls, snapshot=None):
+        """Load resources from a snapshot, or from the corpora if there is none."""
+        if snapshot is None:
+            snapshot = get_snapshot()
+        freq_dist = word_frequencies()
+        version = data_version(snapshot, freq_dist)
+        if snapshot:
+            return cls(
+                snapshot["compounds"],
+                freq_dist,
+                PhoneticIndex(snapshot["pronunciations"]),
+                snapshot["pun_table"],
+                HypernymIndex(**snapshot["hypernym_index"]),
+                version,
+            )
+        return cls(compound_nouns(), freq_dist, PhoneticIndex(cmudict.dict()), version=version)
+
+
+_shared_resources = None
+_shared_resources_lock = threading.Lock()
+
+
+def get_shared_resources():
+    """Return the process-wide LexicalResources, loading them on first use."""
+    global _shared_resources
+    if _shared_resources is None:
+        with _shared_resources_lock:
+            if _shared_resources is None:
+                _shared_resources = LexicalResources.load()
+    return _shared_resources
+
+
+def compound_nouns():
+    """Collect every two-part compound noun lemma from WordNet."""
+    compounds = []
+    for synset in wn.all_synsets('n'):
+        compounds.extend([x.name() for x in synset.lemmas() if x.name().count('_') == 1])
+    return compounds
+
+
+def hypernym_index_from_wordnet():
+    """Index the parents and grandparents of every WordNet noun synset."""
+    parents_of = {synset.offset(): sorted({parent.offset() for parent in synset.hypernyms()})
+                  for synset in wn.all_synsets('n')}
+    offsets = array('I')
+    parent_starts, parents = array('I', [0]), array('I')
+    grandparent_starts, grandparents = array('I', [0]), array('I')
+    for offset in sorted(parents_of):
+        offsets.append(offset)
+        parents.extend(parents_of[offset])
+        parent_starts.append(len(parents))
+        grandparents.extend(sorted({grandparent for parent in parents_of[offset]
+                                    for grandparent in parents_of[parent]}))
+        grandparent_starts.append(len(grandparents))
+    return HypernymIndex(offsets, parent_starts, parents, grandparent_starts, grandparents)
+
+
+def brown_frequencies():
+    """Count lower-cased alphabetic Brown corpus tokens, or None if unavailable."""
+    try:
+        from nltk.probability import FreqDist
+        return FreqDist(word.lower() for word in brown.words() if word.isalpha())
+    except LookupError:
+        return None
+
+
+def text_frequencies(path):
+    """Count lower-cased alphabetic words in a text file, or the .txt files under a directory.
+
+    Returns None if the files cannot be read.
+    """
+    from nltk.probability import FreqDist
+    counts = FreqDist()
+    try:
+        for file_path in _source_files(path, ".txt"):
+            with open(file_path, "r", encoding="utf-8", errors="replace") as text_file:
+                for line in text_file:
+                    counts.update(word.lower() for word in re.findall(r"[^\W\d_]+", line))
+    except OSError:
+        return None
+    return counts
+
+
+def counts_file_frequencies(path):
+    """Read "word count" lines from a counts file; blank lines and # comments are skipped.
+
+    Returns None if the file cannot be read, and raises ValueError on a malformed line.
+    """
+    from nltk.probability import FreqDist
+    counts = FreqDist()
+    try:
+        with open(path, "r", encoding="utf-8") as counts_file:
+            for number, line in enumerate(counts_file, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    word, count = line.split()
+                    counts[word.lower()] += int(count)
+                except ValueError:
+                    raise ValueError(f"{path}:{number}: expected a word and a count") from None
+    except OSError:
+        return None
+    return counts
+
+
+# Frequency source kinds: each takes the path after "kind:" and returns a
+# FreqDist of word counts, or None when the source is unavailable. Other
+# sources can be plugged in by adding an entry.
+FREQUENCY_SOURCES = {
+    "brown": lambda path: brown_frequencies(),
+    "text": text_frequencies,
+    "counts": counts_file_frequencies,
+}
+
+
+def source_frequencies(source=None):
+    """Return the word counts of a frequency source such as "counts:/data/counts.tsv"."""
+    kind, _, path = (source or DEFAULT_FREQUENCY_SOURCE).partition(":")
+    if kind not in FREQUENCY_SOURCES:
+        raise ValueError(f"unknown frequency source {kind!r}; "
+                         f"expected one of {', '.join(sorted(FREQUENCY_SOURCES))}")
+    return FREQUENCY_SOURCES[kind](path)
+
+
+def _source_files(path, suffix=""):
+    """Return the file at path, or the files under a directory ending in suffix, sorted."""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(os.path.join(directory, name)
+                  for directory, _, names in os.walk(path)
+                  for name in names if name.endswith(suffix))
+
+
+def source_fingerprint(source=None):
+    """Identify the data behind a frequency source, as corpus_fingerprint does for NLTK."""
+    source = source or DEFAULT_FREQUENCY_SOURCE
+    kind, _, path = source.partition(":")
+    if kind == "brown":
+        return corpus_fingerprint(FREQUENCY_TABLE_CORPORA)
+    digest = hashlib.sha1(source.encode("utf-8"))
+    for file_path in _source_files(path) if path else []:
+        try:
+            stat = os.stat(file_path)
+            digest.update(repr((file_path, stat.st_size, int(stat.st_mtime))).encode("utf-8"))
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def word_frequencies():
+    """Return the memory-mapped frequency table, or count the source live if none is built.
+
+    Returns None, leaving information content at 0, when the source is
+    unavailable or misconfigured; building the table reports why.
+    """
+    table = load_frequency_table()
+    if table is not None:
+        return table
+    try:
+        return source_frequencies()
+    except ValueError:
+        return None
+
+
+def pun_table(compounds, pronunciations):
+    """Precompute the pun table for the given compounds and pronunciations."""
+    # schemata imports this module, so only import it once loading is done
+    from schemata import Lotus
+    resources = LexicalResources(compounds, None, PhoneticIndex(pronunciations))
+    return Lotus(resources=resources, generate=False).build_pun_table()
+
+
+def verb_lexicon_from_wordnet(lemma_names=None):
+    """Compile a VerbLexicon from the installed WordNet.
+
+    Derived verbs are worked out for lemma_names, or for every lemma when
+    None; the other tables always cover all of WordNet.
+    """
+    # templates imports this module, so only import it once loading is done
+    from templates import GrammaticalTemplate
+    grammar = GrammaticalTemplate(verb_lexicon=False)
+    # morphy's tables are private to the corpus reader, so copy them out
+    lemma_pos = {lemma: "".join(sorted(offsets))
+                 for lemma, offsets in wn._lemma_pos_offset_map.items()}
+    exceptions = {pos: {form: tuple(bases) for form, bases in forms.items()}
+                  for pos, forms in wn._exception_map.items()}
+    substitutions = {pos: tuple(rules) for pos, rules in wn.MORPHOLOGICAL_SUBSTITUTIONS.items()}
+
+    derived_verbs = {}
+    for lemma in (lemma_pos if lemma_names is None else lemma_names):
+        verb = grammar._find_related_verb_wordnet(lemma)
+        if verb:
+            derived_verbs[lemma] = verb
+    return VerbLexicon(lemma_pos, exceptions, substitutions, derived_verbs)
+
+
+def _resource_files(resource):
+    """Yield (name, size, mtime) for the files backing an NLTK resource."""
+    pointer = nltk.data.find(resource)
+    if hasattr(pointer, "zipfile"):
+        paths = [pointer.zipfile.filename]
+    elif os.path.isdir(pointer.path):
+        paths = [os.path.join(pointer.path, name) for name in sorted(os.listdir(pointer.path))]
+    else:
+        paths = [pointer.path]
+    for path in paths:
+        stat = os.stat(path)
+        yield os.path.basename(path), stat.st_size, int(stat.st_mtime)
+
+
+def corpus_fingerprint(resources=SNAPSHOT_CORPORA):
+    """Identify the installed NLTK version and corpus data.
+
+    Any change to either produces a different fingerprint, which is how
+    stale snapshots are detected.
+    """
+    digest = hashlib.sha1(nltk.__version__.encode("utf-8"))
+    for resource in resources:
+        digest.update(resource.encode("utf-8"))
+        try:
+            for entry in _resource_files(resource):
+                digest.update(repr(entry).encode("utf-8"))
+        except LookupError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def lexicon_version():
+    """Return a version string for data derived from the installed lexicon.
+
+    Used to key persistent caches so they are invalidated together with
+    snapshots, when a snapshot's pun table starts or stops being used, or
+    when word frequencies come from another source.
+    """
+    return data_version(get_snapshot(), load_frequency_table())
+
+
+def data_version(snapshot, freq_dist):
+    """Return the lexicon_version() of resources built from snapshot and freq_dist."""
+    # Generation from the pun table finds puns live lookup does not
+    pun_source = f"table:{snapshot['fingerprint']}" if snapshot else "live"
+    if isinstance(freq_dist, FrequencyTable):
+        frequencies = f"{freq_dist.fingerprint}:{freq_dist.ic_mode}"
+    else:
+        # Counted live from the active source, so key on that source's data
+        frequencies = f"live:{source_fingerprint()}"
+    digest = hashlib.sha1(f"{corpus_fingerprint()}:{pun_source}:{frequencies}".encode("utf-8")).hexdigest()
+    return f"{SNAPSHOT_FORMAT}-{digest}"
+
+
+def build_snapshot(path=None):
+    """Derive the lexicon from the NLTK corpora and write it to path."""
+    path = path or DEFAULT_SNAPSHOT_PATH
+    compounds = compound_nouns()
+    pronunciations = cmudict.dict()
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "fingerprint": corpus_fingerprint(),
+        "compounds": compounds,
+        "pronunciations": pronunciations,
+        "pun_table": pun_table(compounds, pronunciations),
+        "hypernym_index": hypernym_index_from_wordnet().to_arrays(),
+    }
+
+    _write_atomically(path, snapshot)
+    return snapshot
+
+
+@contextmanager
+def _atomic_open(path):
+    """Open a temporary file that replaces path once it is completely written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as data_file:
+        yield data_file
+    os.replace(tmp_path, path)
+
+
+def _write_atomically(path, data):
+    """Pickle data to path so concurrent readers never see a partial file."""
+    with _atomic_open(path) as data_file:
+        pickle.dump(data, data_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def build_frequency_table(path=None, source=None, ic_mode=WORD_IC):
+    """Count the words of a frequency source and write them to path as a frequency table.
+
+    Information content is precomputed per word, from the word's own count
+    or, with ic_mode SYNSET_IC, from the counts its first noun sense
+    subsumes. Returns the loaded table, or None without writing anything
+    when the source is not available (the Brown corpus is not installed).
+    """
+    path = path or DEFAULT_FREQUENCY_TABLE_PATH
+    source = source or DEFAULT_FREQUENCY_SOURCE
+    if ic_mode not in IC_MODES:
+        raise ValueError(f"unknown information content mode {ic_mode!r}")
+    frequencies = source_frequencies(source)
+    if frequencies is None:
+        return None
+    information_content = synset_information_content(frequencies) if ic_mode == SYNSET_IC else None
+    write_frequency_table(path, frequencies, source_fingerprint(source), information_content, ic_mode)
+    return load_frequency_table(path, source)
+
+
+def load_frequency_table(path=None, source=None):
+    """Memory-map the frequency table at path.
+
+    Returns None when the file is missing, unreadable, written in another
+    format, or built from other data than source currently holds.
+    """
+    path = path or DEFAULT_FREQUENCY_TABLE_PATH
+    try:
+        with open(path, "rb") as table_file:
+            data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        table = FrequencyTable(data)
+    except (OSError, ValueError):
+        return None
+    if table.format != FREQUENCY_TABLE_FORMAT:
+        return None
+    if table.fingerprint != source_fingerprint(source):
+        return None
+    return table
+
+
+def load_snapshot(path=None):
+    """Load a snapshot from path.
+
+    Returns None when the file is missing, unreadable, written in another
+    format, or built from different NLTK data than is installed now.
+    """
+    path = path or DEFAULT_SNAPSHOT_PATH
+    try:
+        with open(path, "rb") as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        return None
+    if snapshot.get("fingerprint") != corpus_fingerprint():
+        return None
+    return snapshot
+
+
+def build_verb_lexicon(path=None):
+    """Compile the verb lexicon from WordNet and write it to path."""
+    path = path or DEFAULT_VERB_LEXICON_PATH
+    verbs = verb_lexicon_from_wordnet()
+    artifact = {
+        "format": VERB_LEXICON_FORMAT,
+        "fingerprint": corpus_fingerprint(VERB_LEXICON_CORPORA),
+        "lemma_pos": verbs.lemma_pos,
+        "exceptions": verbs.exceptions,
+        "substitutions": verbs.substitutions,
+        "derived_verbs": verbs.derived_verbs,
+    }
+    _write_atomically(path, artifact)
+    return verbs
+
+
+def load_verb_lexicon(path=None):
+    """Load the verb lexicon from path.
+
+    Returns None when the file is missing, unreadable, written in another
+    format, or built from a different WordNet than is installed now.
+    """
+    path = path or DEFAULT_VERB_LEXICON_PATH
+    try:
+        with open(path, "rb") as artifact_file:
+            artifact = pickle.load(artifact_file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(artifact, dict) or artifact.get("format") != VERB_LEXICON_FORMAT:
+        return None
+    if artifact.get("fingerprint") != corpus_fingerprint(VERB_LEXICON_CORPORA):
+        return None
+    return VerbLexicon(artifact["lemma_pos"], artifact["exceptions"],
+                       artifact["substitutions"], artifact["derived_verbs"])
+
+
+_snapshot = None
+_snapshot_loaded = False
+
+
+def get_snapshot():
+    """Return the process-wide snapshot, loading it on first use.
+
+    Returns None when no valid snapshot exists; callers then fall back to
+    reading the corpora directly.
+    """
+    global _snapshot, _snapshot_loaded
+    if not _snapshot_loaded:
+        _snapshot = load_snapshot()
+        _snapshot_loaded = True
+    return _snapshot
+
+
+_verb_lexicon = None
+_verb_lexicon_loaded = False
+
+
+def get_verb_lexicon():
+    """Return the process-wide verb lexicon, loading it on first use.
+
+    Returns None when no valid verb lexicon has been built; the grammar
+    layer then queries WordNet directly.
+    """
+    global _verb_lexicon, _verb_lexicon_loaded
+    if not _verb_lexicon_loaded:
+        _verb_lexicon = load_verb_lexicon()
+        _verb_lexicon_loaded = True
+    return _verb_lexicon
+
+
+def main(argv=None):
+    """Command line entry point for managing the snapshot, verb lexicon and frequency table."""
+    parser = argparse.ArgumentParser(description="Manage the pun generator lexicon snapshot.")
+    parser.add_argument("command", choices=["build", "info"],
+                        help="build a fresh snapshot or report on the existing one")
+    parser.add_argument("--path", default=DEFAULT_SNAPSHOT_PATH,
+                        help=f"snapshot location (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument("--verb-path", default=DEFAULT_VERB_LEXICON_PATH,
+                        help=f"verb lexicon location (default: {DEFAULT_VERB_LEXICON_PATH})")
+    parser.add_argument("--frequency-path", default=DEFAULT_FREQUENCY_TABLE_PATH,
+                        help=f"frequency table location (default: {DEFAULT_FREQUENCY_TABLE_PATH})")
+    parser.add_argument("--frequency-source", default=DEFAULT_FREQUENCY_SOURCE,
+                        help="word counts to compile: brown, text:PATH or counts:PATH "
+                             f"(default: {DEFAULT_FREQUENCY_SOURCE})")
+    parser.add_argument("--information-content", choices=IC_MODES, default=WORD_IC,
+                        help="precompute information content per word or per noun sense "
+                             f"(default: {WORD_IC})")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        snapshot = build_snapshot(args.path)
+        print(f"Snapshot written to {args.path}")
+    else:
+        snapshot = load_snapshot(args.path)
+        if snapshot is None:
+            print(f"No valid snapshot at {args.path}")
+            return 1
+        print(f"Snapshot at {args.path}")
+
+    print(f"  Compounds: {len(snapshot['compounds'])}")
+    print(f"  Pronunciations: {len(snapshot['pronunciations'])}")
+    print(f"  Pun candidates: {len(snapshot['pun_table'])}")
+    print(f"  Indexed noun synsets: {len(snapshot['hypernym_index']['offsets'])}")
+
+    if args.command == "build":
+        verbs = build_verb_lexicon(args.verb_path)
+        print(f"Verb lexicon written to {args.verb_path}")
+    else:
+        verbs = load_verb_lexicon(args.verb_path)
+        if verbs is None:
+            print(f"No valid verb lexicon at {args.verb_path}")
+            return 1
+        print(f"Verb lexicon at {args.verb_path}")
+
+    print(f"  WordNet lemmas: {len(verbs.lemma_pos)}")
+    print(f"  Verb lemmas: {sum('v' in pos for pos in verbs.lemma_pos.values())}")
+    print(f"  Derived verbs: {len(verbs.derived_verbs)}")
+
+    if args.command == "build":
+        frequencies = build_frequency_table(args.frequency_path, args.frequency_source,
+                                            args.information_content)
+        if frequencies is None:
+            print(f"Frequency source {args.frequency_source} not available; "
+                  "no frequency table written")
+            return 0
+        print(f"Frequency table written to {args.frequency_path}")
+    else:
+        frequencies = load_frequency_table(args.frequency_path, args.frequency_source)
+        if frequencies is None:
+            print(f"No valid frequency table for {args.frequency_source} at {args.frequency_path}")
+            return 1
+        print(f"Frequency table at {args.frequency_path}")
+
+    print(f"  Source: {args.frequency_source}")
+    print(f"  Word types: {len(frequencies)}")
+    print(f"  Tokens: {frequencies.N()}")
+    print(f"  Information content: per {frequencies.ic_mode}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
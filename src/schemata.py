@@ -1,49 +1,99 @@
-from nltk.corpus import cmudict
-from nltk.corpus import wordnet as wn
-from nltk.corpus import brown
-from nltk.corpus.reader.wordnet import information_content
+from dataclasses import dataclass, asdict
+from contextlib import nullcontext
 import string
 import templates as tmp
+import lexicon
+from lazy import LazyImport
+from scoring import RelevanceScorer
+from cache import ThemeCache
 import random
 import time
 import sys
 
+wn = LazyImport("nltk.corpus", "wordnet")
+
 # Maximum number of related words to process for efficiency
 MAX_RELATED_WORDS = 200
 # Maximum number of puns to find before stopping
 MAX_PUNS_TO_FIND = 10
 # Minimum semantic similarity threshold
 MIN_SIMILARITY_THRESHOLD = 0.3
+# Weights of the WordNet, information content and relationship similarity terms
+WORDNET_WEIGHT = 0.4
+IC_WEIGHT = 0.3
+RELATIONSHIP_WEIGHT = 0.3
+# Highest score of the relationship term, and of the combined similarity
+MAX_RELATIONSHIP_SIMILARITY = 0.6
+MAX_SIMILARITY = min(WORDNET_WEIGHT * 1.0 + IC_WEIGHT * 1.0
+                     + RELATIONSHIP_WEIGHT * MAX_RELATIONSHIP_SIMILARITY, 1.0)
+# Noun senses of a theme expanded into related words, the hypernym levels
+# followed from each, and the WordNet relations followed one level
+RELATED_WORD_SENSES = 3
+RELATED_WORD_DEPTH = 2
+RELATED_WORD_RELATIONS = frozenset({"synonyms", "hypernyms", "hyponyms", "meronyms", "holonyms"})
+# Number of candidate compounds tried per generation method
+MAX_PUN_ATTEMPTS = 100
+# Countdown length before revealing the answer in interactive sessions
+COUNTDOWN_SECONDS = 3
+
+@dataclass(frozen=True)
+class Pun:
+  """A generated pun and the lexical choices behind it."""
+  question: str
+  answer: str
+  # Compound noun the pun is built on, e.g. serial_killer
+  compound: str
+  # Homophone substituted for the compound's first lexeme, e.g. cereal
+  homophone: str
+  # Relevance of the compound to the theme; None for untargeted puns
+  score: float = None
+  theme: str = None
+
+  def to_dict(self):
+    """Return the pun as a plain dict, e.g. for JSON output."""
+    return asdict(self)
 
 class Lotus():
   # What kind of murderer has fiber? A cereal killer.
-  def __init__(self, input_word=None):
+  def __init__(self, input_word=None, resources=None, generate=True, display=True, theme_cache=None,
+               instrumentation=None):
+    # Corpus data is loaded once per process and shared between instances
+    self.resources = resources or lexicon.get_shared_resources()
+    # Optional persistent theme -> puns cache (cache.ThemeCache)
+    self.theme_cache = theme_cache
+    # Optional per-stage timing (instrumentation.Instrumentation)
+    self.instrumentation = instrumentation
     self.nplist = self.nounPhrase()
     self.input_word = input_word
     self.found_puns = []
     
-    # Build frequency distribution for semantic similarity calculations
-    self.freq_dist = self._build_frequency_distribution()
+    # Frequency distribution for semantic similarity calculations
+    self.freq_dist = self.resources.freq_dist
+    
+    # Callers serving many themes construct once and generate on demand
+    if not generate:
+      return
     
     if input_word:
-      self.generate_themed_pun(input_word)
+      pun = self.generate_themed_pun(input_word)
     else:
-      self.generate_random_pun()
+      pun = self.generate_random_pun()
     
-  def _build_frequency_distribution(self):
-    """Build a frequency distribution from Brown corpus for semantic calculations."""
-    try:
-      from nltk.probability import FreqDist
-      words = [word.lower() for word in brown.words() if word.isalpha()]
-      return FreqDist(words)
-    except:
-      # Fallback if Brown corpus is not available
-      return None
+    # Printing is presentation only; library callers read found_puns instead
+    if display:
+      self._display_pun_with_countdown(pun)
       
   def semantic_similarity(self, word1, word2):
     """Calculate semantic similarity between two words using multiple methods."""
     if not word1 or not word2:
       return 0.0
+    
+    # The score is symmetric and case-insensitive, so both argument orders
+    # share one entry in the process-wide cache
+    key = frozenset((word1.lower(), word2.lower()))
+    cached = self.resources.similarity_cache.get(key)
+    if cached is not None:
+      return cached
       
     # Method 1: WordNet-based path similarity
     wordnet_sim = self._wordnet_similarity(word1, word2)
@@ -55,15 +105,40 @@ class Lotus():
     rel_sim = self._relationship_similarity(word1, word2)
     
     # Combine similarities with weights
-    combined_sim = (wordnet_sim * 0.4 + ic_sim * 0.3 + rel_sim * 0.3)
+    combined_sim = min(wordnet_sim * WORDNET_WEIGHT + ic_sim * IC_WEIGHT
+                       + rel_sim * RELATIONSHIP_WEIGHT, 1.0)
+    
+    self.resources.similarity_cache.put(key, combined_sim)
+    return combined_sim
+    
+  def similarity_upper_bound(self, word1, word2):
+    """Cheap upper bound on semantic_similarity, used to prune candidates.
+    
+    Only the path similarity search is skipped: distinct senses are at least
+    one step apart, so it is 1.0 for a shared sense and at most 0.5 otherwise.
+    """
+    if not word1 or not word2:
+      return 0.0
+    
+    synsets1 = self.resources.noun_synsets(word1)
+    synsets2 = self.resources.noun_synsets(word2)
+    if not synsets1 or not synsets2:
+      wordnet_bound = 0.0
+    elif set(synsets1[:3]).intersection(synsets2[:3]):
+      wordnet_bound = 1.0
+    else:
+      wordnet_bound = 0.5
     
-    return min(combined_sim, 1.0)
+    ic_sim = self._information_content_similarity(word1, word2)
+    rel_sim = self._relationship_similarity(word1, word2)
+    return min(wordnet_bound * WORDNET_WEIGHT + ic_sim * IC_WEIGHT
+               + rel_sim * RELATIONSHIP_WEIGHT, 1.0)
     
   def _wordnet_similarity(self, word1, word2):
     """Calculate WordNet path similarity."""
     try:
-      synsets1 = wn.synsets(word1, pos=wn.NOUN)
-      synsets2 = wn.synsets(word2, pos=wn.NOUN)
+      synsets1 = self.resources.noun_synsets(word1)
+      synsets2 = self.resources.noun_synsets(word2)
       
       if not synsets1 or not synsets2:
         return 0.0
@@ -85,15 +160,10 @@ class Lotus():
       return 0.0
       
     try:
-      import math
-      # Get frequency counts
-      freq1 = self.freq_dist.get(word1.lower(), 1)
-      freq2 = self.freq_dist.get(word2.lower(), 1)
-      
-      # Calculate information content (negative log probability)
-      total_words = self.freq_dist.N()
-      ic1 = -math.log(freq1 / total_words)
-      ic2 = -math.log(freq2 / total_words)
+      # Information content (negative log probability), precomputed per
+      # word when the frequencies come from a compiled frequency table
+      ic1 = self.resources.information_content(word1.lower())
+      ic2 = self.resources.information_content(word2.lower())
       
       # Similarity is inverse of distance between information contents
       ic_distance = abs(ic1 - ic2)
@@ -104,224 +174,355 @@ class Lotus():
   def _relationship_similarity(self, word1, word2):
     """Calculate similarity based on semantic relationships."""
     try:
-      # Check for shared hypernyms (common categories)
-      synsets1 = wn.synsets(word1, pos=wn.NOUN)
-      synsets2 = wn.synsets(word2, pos=wn.NOUN)
+      # Check for shared hypernyms (common categories), compared as sets of
+      # integer synset IDs for the top two senses of each word
+      senses1 = self.resources.hypernym_ids(word1)
+      senses2 = self.resources.hypernym_ids(word2)
       
-      for s1 in synsets1[:2]:
-        for s2 in synsets2[:2]:
-          # Check if they share hypernyms at different levels
-          hyp1 = set(s1.hypernyms())
-          hyp2 = set(s2.hypernyms())
-          
-          if hyp1.intersection(hyp2):
-            return 0.6  # Share immediate hypernyms
+      # Best over all sense pairs, so the score does not depend on argument order
+      best = 0.0
+      for parents1, grandparents1 in senses1:
+        for parents2, grandparents2 in senses2:
+          if not parents1.isdisjoint(parents2):
+            return MAX_RELATIONSHIP_SIMILARITY  # Share immediate hypernyms
             
-          # Check second-level hypernyms
-          hyp1_2 = set()
-          hyp2_2 = set()
-          for h in hyp1:
-            hyp1_2.update(h.hypernyms())
-          for h in hyp2:
-            hyp2_2.update(h.hypernyms())
+          if not grandparents1.isdisjoint(grandparents2):
+            best = 0.4  # Share second-level hypernyms
             
-          if hyp1_2.intersection(hyp2_2):
-            return 0.4  # Share second-level hypernyms
-            
-      return 0.0
+      return best
     except:
       return 0.0
 
+  def _stage(self, name):
+    """Time the enclosed block as a pipeline stage when instrumented."""
+    if self.instrumentation is None:
+      return nullcontext()
+    return self.instrumentation.stage(name)
+  
+  def _request(self, label):
+    """Record the enclosed block as one request when instrumented."""
+    if self.instrumentation is None:
+      return nullcontext()
+    return self.instrumentation.request(label, self._cache_stats)
+  
+  def _cache_stats(self):
+    """Return counters for every cache consulted while generating."""
+    stats = self.resources.cache_stats()
+    if self.theme_cache is not None:
+      stats["theme"] = self.theme_cache.stats()
+    return stats
+
   def generate_random_pun(self):
-    """Generate a random pun without theme constraints."""
-    for npLex in self.nplist:
-      # Lexical Preconditions
-      self.homophone, npLex, self.np2 = self.lexical_preconds(npLex)
-      if not self.homophone:
-        continue
-      # SAD description - generating the question
-      self.qWords = self.sadGen(self.homophone, npLex)
-      if not self.qWords[0] or not self.qWords[1]:
-        continue
-      # Relationships - generating the answer
-      retval = self.relationships(self.qWords, self.np2)
-      if not retval:
-        continue
-      break  # Stop after first successful pun
+    """Generate a random pun without theme constraints.
+    
+    Returns the Pun, or None if no compound yields one. Untargeted puns
+    are not recorded in found_puns.
+    """
+    with self._request(None):
+      return self._generate_random_pun()
+  
+  def _generate_random_pun(self):
+    """Return the first pun in compound list order, or None."""
+    for npLex in self._viable_compounds(self.nplist):
+      pun = self._build_pun(npLex)
+      if pun:
+        return pun  # Stop after first successful pun
+    return None
   
   def generate_themed_pun(self, theme_word):
-    """Generate puns related to the theme word using semantic similarity."""
+    """Generate puns related to the theme word using semantic similarity.
+    
+    Returns the Pun, or None if no pun could be found for the theme. The
+    theme is normalized as the theme cache keys it, and results are served
+    from and stored in that cache when one is configured.
+    """
+    with self._request(theme_word):
+      return self._cached_themed_pun(theme_word)
+  
+  def _cached_themed_pun(self, theme_word):
+    """Serve the theme from the theme cache, generating it on a miss."""
+    # Generate from the cache key itself, so every spelling sharing a key
+    # shares a result
+    theme_word = ThemeCache.normalize(theme_word)
+    if self.theme_cache is None:
+      return self._generate_themed_pun(theme_word)
+    
+    cached = self.theme_cache.get(theme_word)
+    if cached is not None:
+      if not cached:
+        return None
+      pun = Pun(**dict(cached[0], theme=theme_word))
+      self.found_puns.append(pun)
+      return pun
+    
+    pun = self._generate_themed_pun(theme_word)
+    self.theme_cache.put(theme_word, [pun.to_dict()] if pun else [])
+    return pun
+  
+  def _generate_themed_pun(self, theme_word):
+    """Run the full themed generation pipeline, bypassing the theme cache."""
     # Find words related to the theme word (silently)
-    related_words = self.find_related_words(theme_word)
+    with self._stage("find_related_words"):
+      related_words = self.find_related_words(theme_word)
+    scorer = RelevanceScorer(self.semantic_similarity, theme_word, related_words,
+                             self.similarity_upper_bound, MAX_SIMILARITY)
     
     # Quick direct match search first (most efficient)
-    direct_matches = self._find_direct_matches(theme_word, related_words)
+    with self._stage("direct_matches"):
+      direct_matches = self._find_direct_matches(theme_word, related_words)
     
     if direct_matches:
       # Try to generate puns from direct matches first
-      if self._try_generate_puns(direct_matches[:50], "direct match", silent=True):
-        return
+      pun = self._try_generate_puns(direct_matches[:50], "direct match", silent=True, scorer=scorer)
+      if pun:
+        return pun
     
     # If no direct matches worked, try semantic similarity approach
-    scored_compounds = []
-    compounds_processed = 0
     max_compounds_to_check = 10000  # Limit for efficiency
     
-    for npLex in self.nplist[:max_compounds_to_check]:
-      compounds_processed += 1
-      
-      comp_lex = self.splitLexemes(npLex)
-      
-      # Calculate relevance score for this compound
-      relevance_score = self._calculate_compound_relevance(theme_word, comp_lex, related_words)
-      
-      if relevance_score >= MIN_SIMILARITY_THRESHOLD:
-        scored_compounds.append((npLex, relevance_score))
-    
-    # Sort by relevance score (highest first)
-    scored_compounds.sort(key=lambda x: x[1], reverse=True)
+    # Only the best MAX_PUN_ATTEMPTS compounds are ever tried, so keep just
+    # those (highest first) and skip scoring anything that can't make the cut
+    # Lexemes come from the compound table as integer IDs, so no name is re-split
+    with self._stage("scoring"):
+      table = self.resources.compound_table
+      positions = self._viable_positions(range(min(len(table), max_compounds_to_check)))
+      scored_compounds = scorer.top_k([self.nplist[position] for position in positions],
+                                      MAX_PUN_ATTEMPTS, MIN_SIMILARITY_THRESHOLD,
+                                      table.parts(positions))
     
     if len(scored_compounds) > 0:
       # Try to generate puns from scored compounds
-      if self._try_generate_puns([item[0] for item in scored_compounds], "semantic similarity", silent=True):
-        return
+      pun = self._try_generate_puns([item[0] for item in scored_compounds], "semantic similarity",
+                                    silent=True, scorer=scorer)
+      if pun:
+        return pun
     
     # If we get here, no pun was found
-    print("Hmm, I couldn't come up with a good pun for that theme. Try another word!")
+    return None
 
   def _find_direct_matches(self, theme_word, related_words):
     """Find compound words that directly contain theme-related words."""
-    matches = []
     theme_set = set([theme_word.lower()] + [w.lower() for w in related_words[:30]])
     
-    for npLex in self.nplist:
-      comp_lex = self.splitLexemes(npLex)
-      
-      # Check for direct word matches
-      for part in comp_lex:
-        if part.lower() in theme_set:
-          matches.append(npLex)
-          break
-    
-    return matches
+    # Union of the lexeme index posting lists, in compound list order
+    return self._viable_compounds(self.resources.compounds_containing(theme_set))
 
-  def _try_generate_puns(self, compound_list, method_name, silent=False):
-    """Try to generate puns from a list of compounds."""
-    found_pun = False
+  def _try_generate_puns(self, compound_list, method_name, silent=False, scorer=None):
+    """Try to generate puns from a list of compounds.
+    
+    Returns the first Pun found, or None.
+    """
     failed_attempts = 0
     attempts = 0
-    max_attempts = min(100, len(compound_list))  # Limit attempts
+    max_attempts = min(MAX_PUN_ATTEMPTS, len(compound_list))  # Limit attempts
     
     for npLex in compound_list[:max_attempts]:
       attempts += 1
       
       # Try to create a pun from this compound
-      homophone, temp_npLex, np2 = self.lexical_preconds(npLex)
-      if not homophone:
+      pun = self._build_pun(npLex, scorer)
+      if not pun:
         failed_attempts += 1
         continue
       
+      # Successfully generated a pun!
+      self.found_puns.append(pun)
+      return pun
+    
+    return None
+
+  def _build_pun(self, npLex, scorer=None):
+    """Build a Pun from one compound, or return None if it doesn't work."""
+    table = self.resources.pun_table
+    if table is not None:
+      # Lexical preconditions and SAD description were worked out offline
+      with self._stage("pun_table"):
+        entry = table.get(npLex)
+      if entry is None:
+        return None
+      homophone, hypernym, meronym = entry
+      np2 = homophone + " " + self.splitLexemes(npLex)[1]
+      qWords = [hypernym, meronym]
+    else:
+      # Lexical Preconditions
+      with self._stage("lexical_preconds"):
+        homophone, npLex, np2 = self.lexical_preconds(npLex)
+      if not homophone:
+        return None
+      
       # SAD description - generating the question
-      qWords = self.sadGen(homophone, npLex)
+      with self._stage("sad_gen"):
+        qWords = self.sadGen(homophone, npLex)
       if not qWords[0] or not qWords[1]:
-        failed_attempts += 1
-        continue
-      
-      # Successfully generated a pun!
-      self._display_pun_with_countdown(qWords, np2)
-      found_pun = True
-      break
+        return None
+    
+    # Relationships - generating the answer
+    with self._stage("template"):
+      verb_phrase = tmp.grammar_processor._create_verb_phrase(qWords[1])
+    question = f"What do you call a {qWords[0]} that {verb_phrase}?"
+    score = scorer.compound_score(self.splitLexemes(npLex)) if scorer else None
+    return Pun(question, np2, npLex, homophone, score, scorer.theme_word if scorer else None)
+
+  def _viable_compounds(self, compounds):
+    """Drop the compounds the pun table rules out, keeping their order.
     
-    return found_pun
+    Without a table every compound is kept and checked at request time.
+    """
+    table = self.resources.pun_table
+    if table is None:
+      return compounds
+    return [npLex for npLex in compounds if npLex in table]
 
-  def _display_pun_with_countdown(self, qWords, np2):
-    """Display the pun with a countdown reveal."""
+  def _viable_positions(self, positions):
+    """Like _viable_compounds, for positions in the compound list."""
+    table = self.resources.pun_table
+    if table is None:
+      return list(positions)
+    return [position for position in positions if self.nplist[position] in table]
+
+  def build_pun_table(self):
+    """Work out the homophone, hypernym and meronym for every viable compound.
+    
+    Returns a dict of compound -> (homophone, hypernym, meronym) holding only
+    the compounds that can produce a pun. Built offline with the lexicon
+    snapshot so request-time search skips the rest.
+    """
+    table = {}
+    for npLex in self.nplist:
+      homophone, npLex, np2 = self.lexical_preconds(npLex)
+      if not homophone:
+        continue
+      qWords = self.sadGen(homophone, npLex)
+      if qWords[0] and qWords[1]:
+        # Meronyms may be Synsets; the question only ever uses their text
+        table[npLex] = (homophone, qWords[0], str(qWords[1]))
+    return table
+
+  def _display_pun_with_countdown(self, pun, countdown=0):
+    """Display the pun, optionally with a countdown reveal.
+    
+    The countdown sleeps for one second per step, so it is only meant for
+    interactive sessions; by default the answer is revealed immediately.
+    """
+    if pun is None:
+      print("Hmm, I couldn't come up with a good pun for that theme. Try another word!")
+      return
+    
     # Display the question
-    question = f"What do you call a {qWords[0]} that {tmp.grammar_processor._create_verb_phrase(qWords[1])}?"
-    print(f"\n{question}")
+    print(f"\n{pun.question}")
     
     # Countdown
-    print("\n", end="")
-    for i in range(3, 0, -1):
-      print(f"{i}...", end="", flush=True)
-      time.sleep(1)
+    if countdown:
+      print("\n", end="")
+      for i in range(countdown, 0, -1):
+        print(f"{i}...", end="", flush=True)
+        time.sleep(1)
     
     # Reveal answer
-    print(f"\nA {np2}!")
+    print(f"\nA {pun.answer}!")
 
   def _calculate_compound_relevance(self, theme_word, compound_parts, related_words):
     """Calculate how relevant a compound noun is to the theme."""
-    max_relevance = 0.0
-    
-    # Check relevance of each part of the compound
-    for part in compound_parts:
-      # Direct theme word match
-      if part.lower() == theme_word.lower():
-        max_relevance = max(max_relevance, 1.0)
-        continue
-        
-      # Match with related words
-      for related_word in related_words:
-        if part.lower() == related_word.lower():
-          max_relevance = max(max_relevance, 0.9)
-          continue
-          
-      # Semantic similarity with theme word
-      similarity = self.semantic_similarity(theme_word, part)
-      max_relevance = max(max_relevance, similarity)
-      
-      # Semantic similarity with related words
-      for related_word in related_words[:20]:  # Check top 20 related words
-        similarity = self.semantic_similarity(related_word, part)
-        max_relevance = max(max_relevance, similarity * 0.8)  # Discount indirect similarity
-        
-    return max_relevance
+    scorer = RelevanceScorer(self.semantic_similarity, theme_word, related_words)
+    return scorer.compound_score(compound_parts)
 
-  def find_related_words(self, word):
-    """Find words related to the input word using comprehensive semantic relationships."""
-    related = set()
+  def find_related_words(self, word, depth=RELATED_WORD_DEPTH, relations=RELATED_WORD_RELATIONS):
+    """Find words related to the input word using comprehensive semantic relationships.
     
-    # Add the original word
-    related.add(word.lower())
+    Expansions are memoized process-wide on (word, depth, relations) and
+    listed in discovery order, starting with the word itself.
+    """
+    return list(self.find_related_words_batch([word], depth, relations)[0])
+  
+  def find_related_words_batch(self, words, depth=RELATED_WORD_DEPTH, relations=RELATED_WORD_RELATIONS):
+    """Expand many words at once, returning a tuple of related words per word.
     
-    # Get all synsets for the word
-    synsets = wn.synsets(word, pos=wn.NOUN)
+    Each WordNet relation of a synset is looked up once per batch, so the
+    shared ancestors of e.g. "cat" and "dog" are only walked once.
+    """
+    relations = frozenset(relations)
+    expansions = {}
+    results = []
+    for word in words:
+      key = (word.lower(), depth, relations)
+      related = self.resources.related_cache.get(key)
+      if related is None:
+        related = self._expand_related_words(word.lower(), depth, relations, expansions)
+        self.resources.related_cache.put(key, related)
+      results.append(related)
+    return results
+  
+  def _expand_related_words(self, word, depth, relations, expansions):
+    """Walk WordNet from the top noun senses of word; expansions memoizes the walk."""
+    # A dict keeps the words unique and in the order they were found
+    related = {word: None}
     
-    for synset in synsets[:3]:  # Focus on top 3 most common senses
-      # Add synonyms
-      for lemma in synset.lemmas():
-        related.add(lemma.name().lower())
-      
-      # Add hypernyms (more general terms) - multiple levels
-      hypernyms = synset.hypernyms()
-      for hypernym in hypernyms:
-        for lemma in hypernym.lemmas():
-          related.add(lemma.name().lower())
-          
-        # Add second-level hypernyms for broader context
-        for hyp2 in hypernym.hypernyms():
-          for lemma in hyp2.lemmas():
-            related.add(lemma.name().lower())
-      
-      # Add hyponyms (more specific terms)
-      for hyponym in synset.hyponyms():
-        for lemma in hyponym.lemmas():
-          related.add(lemma.name().lower())
-      
-      # Add meronyms (parts)
-      for meronym in synset.part_meronyms() + synset.member_meronyms() + synset.substance_meronyms():
-        for lemma in meronym.lemmas():
-          related.add(lemma.name().lower())
-      
-      # Add holonyms (wholes that this is part of)
-      for holonym in synset.part_holonyms() + synset.member_holonyms() + synset.substance_holonyms():
-        for lemma in holonym.lemmas():
-          related.add(lemma.name().lower())
+    for synset in self.resources.noun_synsets(word)[:RELATED_WORD_SENSES]:  # Top senses
+      related.update(dict.fromkeys(self._synset_related_lemmas(synset, depth, relations, expansions)))
+    
+    # Remove multi-word terms
+    return tuple(w for w in related if '_' not in w and len(w) > 2)
+  
+  def _synset_related_lemmas(self, synset, depth, relations, expansions):
+    """Return the lower-cased lemma names reached from synset over relations."""
+    linked = []
+    if "synonyms" in relations:
+      linked.append(synset)
+    
+    # Hypernyms (more general terms), several levels up for broader context
+    if "hypernyms" in relations:
+      for level in self._hypernym_levels(synset, depth, expansions):
+        linked.extend(level)
+    
+    # Hyponyms (more specific terms)
+    if "hyponyms" in relations:
+      linked.extend(self._linked_synsets(synset, "hyponyms", expansions))
     
-    # Remove multi-word terms and convert to list
-    filtered_related = [w for w in related if '_' not in w and len(w) > 2]
+    # Meronyms (parts)
+    if "meronyms" in relations:
+      for relation in ("part_meronyms", "member_meronyms", "substance_meronyms"):
+        linked.extend(self._linked_synsets(synset, relation, expansions))
     
-    return filtered_related
+    # Holonyms (wholes that this is part of)
+    if "holonyms" in relations:
+      for relation in ("part_holonyms", "member_holonyms", "substance_holonyms"):
+        linked.extend(self._linked_synsets(synset, relation, expansions))
+    
+    return tuple(name for s in linked for name in self._lemma_names(s, expansions))
+  
+  def _hypernym_levels(self, synset, depth, expansions):
+    """Return depth levels of hypernyms above synset, each in walk order, memoized."""
+    key = (synset, "hypernym_levels", depth)
+    levels = expansions.get(key)
+    if levels is None:
+      levels = ()
+      if depth:
+        parents = self._linked_synsets(synset, "hypernyms", expansions)
+        # Level n above synset is level n - 1 above each parent, in turn
+        above = [self._hypernym_levels(parent, depth - 1, expansions) for parent in parents]
+        levels = (parents,) + tuple(tuple(s for parent_levels in above for s in parent_levels[n])
+                                    for n in range(depth - 1))
+      expansions[key] = levels
+    return levels
+  
+  @staticmethod
+  def _linked_synsets(synset, relation, expansions):
+    """Return the synsets linked to synset by an NLTK relation method, memoized."""
+    key = (synset, relation)
+    linked = expansions.get(key)
+    if linked is None:
+      # NLTK relation lookups come from sets, so sort them for a stable order
+      linked = expansions[key] = tuple(sorted(getattr(synset, relation)()))
+    return linked
+  
+  @staticmethod
+  def _lemma_names(synset, expansions):
+    """Return the lower-cased lemma names of synset, memoized."""
+    key = (synset, "lemmas")
+    names = expansions.get(key)
+    if names is None:
+      names = expansions[key] = tuple(lemma.name().lower() for lemma in synset.lemmas())
+    return names
   
   def is_related(self, word1, word2):
     """Check if word1 is related to word2 using semantic similarity."""
@@ -366,30 +567,22 @@ class Lotus():
 
   def nounPhrase(self):
     # Finds a compound lexeme in WordNet, returns lemma/list of lemmas
-    compNoms = []
-    for synset in list(wn.all_synsets('n')):
-      compNoms.extend([x.name() for x in synset.lemmas() if x.name().count('_')==1 and x.name() != []])
-    return compNoms
+    return self.resources.compounds
 
   def splitLexemes(self, nounPhrase):
     # Splits nounPhrase into component lexemes
     return nounPhrase.split('_')
 
   def getHomophone(self, wordA):
-    # Finds a homophone of wordA
-    phones = cmudict.dict()
-    phone1 = []
-    if wordA not in phones.keys():
+    # Finds a homophone of wordA using the shared phonetic index
+    phones = self.resources.phonetic_index
+    if wordA not in phones:
       return 0
-    phone1.extend(phones[wordA])
-    phoneLst = []
-    for i in phones.keys():
-      if [a for a in phone1 if a in phones[i] and i != wordA]:
-        phoneLst.append(i)
-    if not phoneLst:
+    homophone = phones.first_homophone(wordA)
+    if not homophone:
       #print 'No homophone found for ' + wordA
       return False
-    return phoneLst[0]
+    return homophone
 
   def getHypernym(self,np):
     # Gets most frequent hypernym of np
@@ -436,7 +629,11 @@ class Lotus():
 def main():
   # If running directly, get input from user
   theme_word = input("Enter a theme word for your pun: ").strip()
-  lotus = Lotus(theme_word)
+  lotus = Lotus(generate=False)
+  pun = lotus.generate_themed_pun(theme_word) if theme_word else lotus.generate_random_pun()
+  # The dramatic pause is only worth it when someone is watching
+  countdown = COUNTDOWN_SECONDS if sys.stdin.isatty() and sys.stdout.isatty() else 0
+  lotus._display_pun_with_countdown(pun, countdown)
 
 if __name__ == '__main__':
   main()
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+Batch relevance scoring for themed pun generation.
+
+A compound is as relevant as its most relevant part, and a part's relevance
+depends only on the part itself once the theme is fixed. Scoring a batch of
+compounds therefore reduces to scoring each distinct part once and reading
+the compound scores out of that table.
+
+When only the best few compounds are needed, top_k avoids most of that work
+by comparing cheap upper bounds on each part's relevance against the current
+k-th best score before computing anything exact.
+"""
+
+import heapq
+
+# Discount applied to similarity with related words rather than the theme
+INDIRECT_SIMILARITY_WEIGHT = 0.8
+# Number of related words compared against each part
+RELATED_WORDS_COMPARED = 20
+
+
+class RelevanceScorer:
+    """Scores compound nouns against one theme and its related words."""
+
+    def __init__(self, similarity, theme_word, related_words,
+                 similarity_bound=None, similarity_ceiling=1.0):
+        self.similarity = similarity
+        # Optional cheap function never below similarity for the same pair
+        self.similarity_bound = similarity_bound
+        # Largest value similarity can ever return
+        self.similarity_ceiling = similarity_ceiling
+        self.theme_word = theme_word
+        self.theme = theme_word.lower()
+        self.related = frozenset(word.lower() for word in related_words)
+        self.compared = related_words[:RELATED_WORDS_COMPARED]
+        # part (as written in the compound) -> relevance
+        self._part_scores = {}
+        # part -> upper bound on its relevance, from similarity_bound
+        self._part_bounds = {}
+
+    def part_score(self, part):
+        """Return the relevance of a single compound part, memoized per scorer."""
+        score = self._part_scores.get(part)
+        if score is not None:
+            return score
+
+        # Direct theme or related word match
+        score = self._direct_score(part.lower())
+        if score < self.similarity_ceiling:
+            # Semantic similarity with the theme word
+            score = max(score, self.similarity(self.theme_word, part))
+            # Semantic similarity with related words, discounted as indirect
+            for related_word in self.compared:
+                score = max(score, self.similarity(related_word, part) * INDIRECT_SIMILARITY_WEIGHT)
+
+        self._part_scores[part] = score
+        return score
+
+    def _direct_score(self, lowered):
+        """Return the relevance a part gets from matching words alone."""
+        if lowered == self.theme:
+            return 1.0
+        return 0.9 if lowered in self.related else 0.0
+
+    def part_upper_bound(self, part, floor=None):
+        """Return a value no lower than part_score(part), computed cheaply.
+
+        The constant similarity ceiling is tried first; the finer per-pair
+        bounds are only computed when that is not already at or below floor.
+        """
+        score = self._part_scores.get(part)
+        if score is not None:
+            return score
+
+        direct = self._direct_score(part.lower())
+        bound = max(direct, self.similarity_ceiling)
+        if direct >= self.similarity_ceiling or self.similarity_bound is None:
+            return bound
+        if floor is not None and bound <= floor:
+            return bound
+
+        bound = self._part_bounds.get(part)
+        if bound is None:
+            bound = max(direct, self.similarity_bound(self.theme_word, part))
+            for related_word in self.compared:
+                bound = max(bound, self.similarity_bound(related_word, part) * INDIRECT_SIMILARITY_WEIGHT)
+            self._part_bounds[part] = bound
+        return bound
+
+    def compound_score(self, compound_parts):
+        """Return the relevance of a compound given its component lexemes."""
+        return max([self.part_score(part) for part in compound_parts], default=0.0)
+
+    def rank(self, compounds, threshold=0.0):
+        """Score a batch of compounds in one call.
+
+        Returns (compound, score) pairs scoring at least threshold, best
+        first; compounds with equal scores keep their input order.
+        """
+        split = [compound.split('_') for compound in compounds]
+
+        # Score every distinct part once, then take the best part per compound
+        for part in {part for parts in split for part in parts}:
+            self.part_score(part)
+        scores = self._part_scores
+
+        ranked = []
+        for compound, parts in zip(compounds, split):
+            score = max([scores[part] for part in parts], default=0.0)
+            if score >= threshold:
+                ranked.append((compound, score))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    def top_k(self, compounds, k, threshold=0.0, parts=None):
+        """Return the first k items of rank(compounds, threshold).
+
+        Keeps a bounded heap of the best k compounds seen so far and skips
+        exact scoring for any compound whose upper bound cannot beat the
+        current k-th score. Stops early once the heap holds k perfect scores.
+        parts optionally gives each compound's lexemes, e.g. from a
+        CompoundTable, so they are not split out of the names again.
+        """
+        if k <= 0:
+            return []
+
+        # Min-heap of (score, -position, compound); the root is the k-th best
+        # and, on equal scores, the latest in input order
+        heap = []
+        if parts is None:
+            parts = (compound.split('_') for compound in compounds)
+        for position, (compound, compound_parts) in enumerate(zip(compounds, parts)):
+            full = len(heap) == k
+            if full and heap[0][0] >= 1.0:
+                break  # Nothing later can displace a perfect score
+
+            # Later compounds lose ties, so they must score strictly higher
+            floor = heap[0][0] if full else threshold
+
+            bound = max([self.part_upper_bound(part, floor) for part in compound_parts],
+                        default=0.0)
+            if bound < threshold or (full and bound <= floor):
+                continue
+            score = self.compound_score(compound_parts)
+            if score < threshold or (full and score <= floor):
+                continue
+            if full:
+                heapq.heapreplace(heap, (score, -position, compound))
+            else:
+                heapq.heappush(heap, (score, -position, compound))
+
+        ranked = sorted(heap, reverse=True)
+        return [(compound, score) for score, _, compound in ranked]
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Pun Server for Pun Generator
+Serves themed puns as JSON over HTTP from a warm, resident lexicon.
+
+    python src/server.py --port 8000 --workers 4
+    curl 'http://127.0.0.1:8000/pun?theme=food'
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import lexicon
+from cache import ThemeCache
+from schemata import Lotus
+
+# Seconds a client may take to send its request line and headers
+REQUEST_TIMEOUT = 10
+
+# Per-process Lotus used by pool workers
+_worker_lotus = None
+
+def _init_worker(theme_cache_path=None, resources=None):
+    """Build the worker's Lotus once when a pool worker starts."""
+    global _worker_lotus
+    resources = resources or lexicon.get_shared_resources()
+    theme_cache = None
+    if theme_cache_path:
+        theme_cache = ThemeCache(theme_cache_path, resources.version)
+    _worker_lotus = Lotus(resources=resources, generate=False, theme_cache=theme_cache)
+
+def _generate_in_worker(theme_word):
+    """Generate the pun for one theme inside a pool worker, as a dict."""
+    pun = _worker_lotus.generate_themed_pun(theme_word)
+    return pun.to_dict() if pun else None
+
+def _warm_up():
+    """No-op task used to start pool workers before the first request."""
+    return True
+
+class PunServer:
+    """Minimal asyncio HTTP server answering GET /pun?theme=... with JSON.
+
+    Pun generation is CPU-bound, so it runs in a process pool while the event
+    loop keeps accepting connections. The lexicon is loaded once at startup,
+    unless resources are given.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8000, workers=1, theme_cache_path=None,
+                 resources=None, request_timeout=REQUEST_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.theme_cache_path = theme_cache_path
+        # Lexical resources for the workers; the process-wide ones if None
+        self.resources = resources
+        self.request_timeout = request_timeout
+        self.executor = None
+        self.server = None
+
+    async def start(self):
+        """Load the lexicon, start the worker pool and begin listening."""
+        # Loaded before the pool forks so workers inherit it instead of reloading
+        if self.resources is None:
+            lexicon.get_shared_resources()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.theme_cache_path, self.resources))
+
+        # Pay worker start-up now rather than on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, _warm_up)
+                               for _ in range(self.workers)])
+
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Serve requests until cancelled, then shut the pool down."""
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.executor.shutdown()
+
+    async def handle(self, reader, writer):
+        """Answer a single HTTP request on one connection."""
+        try:
+            # An idle client must not hold the connection open indefinitely
+            request_line = await asyncio.wait_for(self._read_request(reader), self.request_timeout)
+            status, body = await self.route(request_line)
+        except asyncio.TimeoutError:
+            status, body = 408, {"error": "request timed out"}
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Return the request line, reading past the headers to the end of the request."""
+        request_line = await reader.readline()
+        # Headers are not used
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+        return request_line
+
+    async def route(self, request_line):
+        """Return (status, JSON body) for a raw HTTP request line."""
+        parts = request_line.decode('latin-1').split()
+        if len(parts) < 2:
+            return 400, {"error": "malformed request"}
+        method, target = parts[0], parts[1]
+        if method != "GET":
+            return 405, {"error": "method not allowed"}
+
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {"status": "ok"}
+        if url.path != "/pun":
+            return 404, {"error": "not found"}
+
+        theme_word = parse_qs(url.query).get("theme", [""])[0].strip()
+        if not theme_word:
+            return 400, {"error": "missing theme parameter"}
+
+        loop = asyncio.get_running_loop()
+        pun = await loop.run_in_executor(self.executor, _generate_in_worker, theme_word)
+        if pun is None:
+            return 404, {"theme": theme_word, "error": "no pun found"}
+        return 200, pun
+
+async def serve(host, port, workers, theme_cache_path=None):
+    """Start a PunServer and run it until interrupted."""
+    server = PunServer(host, port, workers, theme_cache_path)
+    await server.start()
+    print(f"Serving puns on http://{server.host}:{server.port}/pun?theme=...")
+    await server.serve_forever()
+
+def main():
+    """Main function to run the pun server."""
+    parser = argparse.ArgumentParser(description="Serve themed puns as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of pun generation processes (default: 1)")
+    parser.add_argument("--theme-cache", metavar="PATH",
+                        help="SQLite file caching puns per theme across restarts")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.theme_cache))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,92 @@
-from nltk.corpus import wordnet as wn
-from nltk.stem import WordNetLemmatizer
-from nltk.tag import pos_tag
-from nltk.tokenize import word_tokenize
+import json
+import os
+import threading
 
-# Initialize lemmatizer for morphological processing
-lemmatizer = WordNetLemmatizer()
+import lexicon
+from cache import LRUCache
+from lazy import LazyImport
+
+# NLTK is only imported once a word is actually processed
+wn = LazyImport("nltk.corpus", "wordnet")
+# WordNet POS codes, spelled out so using them does not load the corpus
+VERB = 'v'
+NOUN = 'n'
+# Default bounds for the memo caches: finished verb phrases and POS tags,
+# and the per-word verb probes and lemmas they are built from
+PHRASE_CACHE_SIZE = 50000
+WORD_CACHE_SIZE = 200000
+# Bump whenever the saved cache layout or verb phrase logic changes
+CACHE_FILE_FORMAT = 1
+# Cache file preloaded into the shared grammar processor, if any
+DEFAULT_CACHE_PATH = os.environ.get("PUN_GRAMMAR_CACHE")
 
 class GrammaticalTemplate:
-    """Enhanced template class with automatic grammatical correction capabilities."""
+    """Enhanced template class with automatic grammatical correction capabilities.
+    
+    Its memo caches are size-bounded and thread-safe, so one instance can be
+    shared by every thread of a server.
+    """
+    
+    def __init__(self, verb_lexicon=None, phrase_cache_size=PHRASE_CACHE_SIZE,
+                 word_cache_size=WORD_CACHE_SIZE):
+        # Precompiled WordNet tables (lexicon.VerbLexicon). The shared one is
+        # loaded on first use; False, or no built lexicon, means live WordNet.
+        self._verb_lexicon = verb_lexicon
+        self._lemmatizer = None
+        # Bounded, thread-safe caches for performance
+        self._verb_cache = LRUCache(phrase_cache_size)
+        self._pos_cache = LRUCache(phrase_cache_size)
+        # Intermediate results shared between words: whether a string is a
+        # WordNet verb, and lemmas keyed on (word, pos)
+        self._is_verb_cache = LRUCache(word_cache_size)
+        self._lemma_cache = LRUCache(word_cache_size)
+    
+    @property
+    def lemmatizer(self):
+        """WordNet lemmatizer, created on first use."""
+        if self._lemmatizer is None:
+            from nltk.stem import WordNetLemmatizer
+            self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+    
+    @property
+    def verb_lexicon(self):
+        """The precompiled verb lexicon in use, or None to query WordNet."""
+        if self._verb_lexicon is None:
+            self._verb_lexicon = lexicon.get_verb_lexicon() or False
+        return self._verb_lexicon or None
     
-    def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
-        # Cache for performance
-        self._verb_cache = {}
-        self._pos_cache = {}
+    def _is_verb(self, word):
+        """Return True if word has a WordNet verb sense, memoized per word."""
+        is_verb = self._is_verb_cache.get(word)
+        if is_verb is None:
+            verbs = self.verb_lexicon
+            if verbs is not None:
+                is_verb = verbs.is_verb(word)
+            else:
+                is_verb = bool(wn.synsets(word, pos=VERB))
+            self._is_verb_cache.put(word, is_verb)
+        return is_verb
+    
+    def _lemma(self, word, pos):
+        """Return the WordNet lemma of word for pos, memoized."""
+        key = (word, pos)
+        lemma = self._lemma_cache.get(key)
+        if lemma is None:
+            verbs = self.verb_lexicon
+            if verbs is not None:
+                lemma = verbs.lemmatize(word, pos)
+            else:
+                lemma = self.lemmatizer.lemmatize(word, pos=pos)
+            self._lemma_cache.put(key, lemma)
+        return lemma
+    
+    def _derived_verb(self, word):
+        """Return the verb derived from word, from the verb lexicon when it knows word."""
+        verbs = self.verb_lexicon
+        if verbs is not None and word in verbs:
+            return verbs.derived_verb(word)
+        return self._find_related_verb_wordnet(word)
     
     def _get_wordnet_pos(self, treebank_tag):
         """Convert treebank POS tag to WordNet POS tag."""
@@ -30,8 +103,13 @@ class GrammaticalTemplate:
     
     def _analyze_word_pos(self, word):
         """Analyze the part of speech of a word using NLTK POS tagging."""
-        if word in self._pos_cache:
-            return self._pos_cache[word]
+        cached = self._pos_cache.get(word)
+        if cached is not None:
+            return cached
+        
+        # The tagger and tokenizer models are only loaded when first needed
+        from nltk.tag import pos_tag
+        from nltk.tokenize import word_tokenize
         
         # Get POS tag
         tokens = word_tokenize(word.lower())
@@ -39,56 +117,56 @@ class GrammaticalTemplate:
             pos_tags = pos_tag(tokens)
             pos_tag_result = pos_tags[0][1] if pos_tags else 'NN'
             wordnet_pos = self._get_wordnet_pos(pos_tag_result)
-            self._pos_cache[word] = (pos_tag_result, wordnet_pos)
+            self._pos_cache.put(word, (pos_tag_result, wordnet_pos))
             return pos_tag_result, wordnet_pos
         return 'NN', wn.NOUN
     
     def _find_verb_form_automatic(self, word):
         """Automatically find the verb form of a word using WordNet and morphological analysis."""
-        if word in self._verb_cache:
-            return self._verb_cache[word]
+        cached = self._verb_cache.get(word)
+        if cached is not None:
+            return cached
         
         word = word.strip().lower()
         
         # Strategy 1: Check if it's already a verb
-        verb_synsets = wn.synsets(word, pos=wn.VERB)
-        if verb_synsets:
+        if self._is_verb(word):
             conjugated = self._conjugate_verb_automatic(word)
-            self._verb_cache[word] = conjugated
+            self._verb_cache.put(word, conjugated)
             return conjugated
         
         # Strategy 2: Use WordNet derivational relationships
-        verb_form = self._find_related_verb_wordnet(word)
+        verb_form = self._derived_verb(word)
         if verb_form:
             conjugated = self._conjugate_verb_automatic(verb_form)
-            self._verb_cache[word] = conjugated
+            self._verb_cache.put(word, conjugated)
             return conjugated
         
         # Strategy 3: Morphological analysis for -ing forms
         if word.endswith('ing'):
             base_form = self._extract_base_from_ing(word)
-            if base_form and wn.synsets(base_form, pos=wn.VERB):
+            if base_form and self._is_verb(base_form):
                 conjugated = self._conjugate_verb_automatic(base_form)
-                self._verb_cache[word] = conjugated
+                self._verb_cache.put(word, conjugated)
                 return conjugated
         
         # Strategy 4: Try lemmatization with different POS assumptions
-        for pos in [wn.VERB, wn.NOUN]:
-            lemma = self.lemmatizer.lemmatize(word, pos=pos)
-            if lemma != word and wn.synsets(lemma, pos=wn.VERB):
+        for pos in [VERB, NOUN]:
+            lemma = self._lemma(word, pos)
+            if lemma != word and self._is_verb(lemma):
                 conjugated = self._conjugate_verb_automatic(lemma)
-                self._verb_cache[word] = conjugated
+                self._verb_cache.put(word, conjugated)
                 return conjugated
         
         # Strategy 5: Check for common morphological patterns
         verb_form = self._apply_morphological_patterns(word)
         if verb_form:
-            self._verb_cache[word] = verb_form
+            self._verb_cache.put(word, verb_form)
             return verb_form
         
         # Fallback: Create descriptive phrase
         fallback = f"has {word}" if not word.endswith('ing') else f"does {word}"
-        self._verb_cache[word] = fallback
+        self._verb_cache.put(word, fallback)
         return fallback
     
     def _find_related_verb_wordnet(self, word):
@@ -124,16 +202,16 @@ class GrammaticalTemplate:
             len(base) >= 3):
             # Check if the doubled form makes sense
             single_base = base[:-1]
-            if wn.synsets(single_base, pos=wn.VERB):
+            if self._is_verb(single_base):
                 return single_base
         
         # Handle e-dropping (making -> make, writing -> write)
         e_base = base + 'e'
-        if wn.synsets(e_base, pos=wn.VERB):
+        if self._is_verb(e_base):
             return e_base
         
         # Try the base as-is
-        if wn.synsets(base, pos=wn.VERB):
+        if self._is_verb(base):
             return base
         
         return None
@@ -143,7 +221,7 @@ class GrammaticalTemplate:
         # Pattern 1: -er/-or endings (often agent nouns)
         if word.endswith(('er', 'or')):
             base = word[:-2]
-            if wn.synsets(base, pos=wn.VERB):
+            if self._is_verb(base):
                 return self._conjugate_verb_automatic(base)
         
         # Pattern 2: -tion/-sion endings (often action nouns)
@@ -153,7 +231,7 @@ class GrammaticalTemplate:
             if base.endswith('a'):
                 base = base[:-1]  # creation -> creat -> create
             base += 'e' if not base.endswith('e') else ''
-            if wn.synsets(base, pos=wn.VERB):
+            if self._is_verb(base):
                 return self._conjugate_verb_automatic(base)
         
         if word.endswith('sion'):
@@ -162,19 +240,19 @@ class GrammaticalTemplate:
             # Try common patterns
             for suffix in ['de', 'd', '']:
                 test_base = base + suffix
-                if wn.synsets(test_base, pos=wn.VERB):
+                if self._is_verb(test_base):
                     return self._conjugate_verb_automatic(test_base)
         
         # Pattern 3: -ment endings (often result nouns)
         if word.endswith('ment'):
             base = word[:-4]
-            if wn.synsets(base, pos=wn.VERB):
+            if self._is_verb(base):
                 return self._conjugate_verb_automatic(base)
         
         # Pattern 4: -al endings (often adjectives that can be verbs)
         if word.endswith('al'):
             base = word[:-2]
-            if wn.synsets(base, pos=wn.VERB):
+            if self._is_verb(base):
                 return self._conjugate_verb_automatic(base)
         
         return None
@@ -187,12 +265,12 @@ class GrammaticalTemplate:
         if verb.endswith('s') and len(verb) > 1:
             # Try to see if the base form exists
             base = verb[:-1]
-            if wn.synsets(base, pos=wn.VERB):
+            if self._is_verb(base):
                 return verb  # Already conjugated
         
         # Handle irregular verbs using WordNet and morphological analysis
         # Get the lemma form first
-        lemma = self.lemmatizer.lemmatize(verb, pos=wn.VERB)
+        lemma = self._lemma(verb, VERB)
         
         # Apply conjugation rules
         if lemma.endswith('y') and len(lemma) > 1 and lemma[-2] not in 'aeiou':
@@ -210,6 +288,21 @@ class GrammaticalTemplate:
         else:
             return lemma + 's'  # most regular verbs
     
+    def create_verb_phrases(self, words):
+        """Convert a batch of words to verb phrases, in input order.
+        
+        Each distinct word is converted once, and the WordNet verb probes and
+        lemmas worked out along the way are shared by the whole batch.
+        """
+        phrases = {}
+        results = []
+        for word in words:
+            key = str(word).strip().lower() if word else None
+            if key not in phrases:
+                phrases[key] = self._create_verb_phrase(word)
+            results.append(phrases[key])
+        return results
+    
     def _create_verb_phrase(self, word):
         """Convert a word to an appropriate verb phrase for the template."""
         if not word:
@@ -220,9 +313,77 @@ class GrammaticalTemplate:
         
         # Use automatic verb finding
         return self._find_verb_form_automatic(word)
+    
+    def cache_stats(self):
+        """Return hit, miss and eviction counters for the memo caches."""
+        return {
+            "verb_phrases": self._verb_cache.stats(),
+            "pos": self._pos_cache.stats(),
+            "is_verb": self._is_verb_cache.stats(),
+            "lemmas": self._lemma_cache.stats(),
+        }
+    
+    def save_cache(self, path):
+        """Write the cached verb phrases and POS tags to path as JSON.
+        
+        The file is replaced atomically, so servers preloading it never
+        read a partial file.
+        """
+        data = {
+            "format": CACHE_FILE_FORMAT,
+            "fingerprint": lexicon.corpus_fingerprint(lexicon.VERB_LEXICON_CORPORA),
+            "verb_phrases": dict(self._verb_cache.items()),
+            "pos": {word: list(tags) for word, tags in self._pos_cache.items()},
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def preload_cache(self, path):
+        """Load verb phrases and POS tags saved by save_cache.
+        
+        Returns the number of entries loaded: 0 when the file is missing,
+        unreadable, in another format, or saved against a different WordNet.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(data, dict) or data.get("format") != CACHE_FILE_FORMAT:
+            return 0
+        if data.get("fingerprint") != lexicon.corpus_fingerprint(lexicon.VERB_LEXICON_CORPORA):
+            return 0
+        for word, phrase in data["verb_phrases"].items():
+            self._verb_cache.put(word, phrase)
+        for word, tags in data["pos"].items():
+            self._pos_cache.put(word, tuple(tags))
+        return len(data["verb_phrases"]) + len(data["pos"])
+
+_shared_lock = threading.Lock()
+
+def __getattr__(name):
+    """Create the module-level lemmatizer and grammar processor on first access."""
+    if name not in ("lemmatizer", "grammar_processor"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _shared_lock:
+        if name not in globals():
+            if name == "lemmatizer":
+                from nltk.stem import WordNetLemmatizer
+                globals()[name] = WordNetLemmatizer()
+            else:
+                processor = GrammaticalTemplate()
+                if DEFAULT_CACHE_PATH:
+                    processor.preload_cache(DEFAULT_CACHE_PATH)
+                globals()[name] = processor
+    return globals()[name]
 
-# Initialize the grammatical template processor
-grammar_processor = GrammaticalTemplate()
+def get_grammar_processor():
+    """Return the shared GrammaticalTemplate, creating it on first use."""
+    return __getattr__("grammar_processor")
 
 def cereal_killer(l1, l2, ans):
     """Enhanced cereal killer template with automatic grammatical correction."""
@@ -233,7 +394,7 @@ def cereal_killer(l1, l2, ans):
     ans = str(ans).strip() if ans else "unknown"
     
     # Convert l2 to appropriate verb phrase automatically
-    verb_phrase = grammar_processor._create_verb_phrase(l2)
+    verb_phrase = get_grammar_processor()._create_verb_phrase(l2)
     
     # Create grammatically correct question
     print(f"\nWhat do you call a {l1} that {verb_phrase}? A {ans}")
@@ -7,15 +7,33 @@ import unittest
 import sys
 import os
 import json
+import math
 import csv
+import pickle
+import tempfile
+import io
+import asyncio
+import subprocess
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
+from unittest import mock
 
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
 
-from schemata import Lotus
+from schemata import Lotus, Pun
 from templates import GrammaticalTemplate
 from generate_dataset import PunDatasetGenerator
+from server import PunServer
+import lexicon
+from cache import LRUCache, ThemeCache
+from scoring import RelevanceScorer
+from instrumentation import Instrumentation, percentile
+from lexicon import LexicalResources, PhoneticIndex
+import run_benchmarks
 
 
 class TestLotus(unittest.TestCase):
@@ -42,17 +60,684 @@ class TestLotus(unittest.TestCase):
         sim = self.lotus.semantic_similarity("food", "computer")
         self.assertLess(sim, 0.5)
     
+    def test_semantic_similarity_cache(self):
+        """Test that similarity is memoized on the unordered word pair."""
+        cache = self.lotus.resources.similarity_cache
+        first = self.lotus.semantic_similarity("bread", "Cake")
+        hits = cache.hits
+        self.assertEqual(self.lotus.semantic_similarity("cake", "bread"), first)
+        self.assertEqual(cache.hits, hits + 1)
+    
     def test_find_related_words(self):
         """Test finding related words."""
         related = self.lotus.find_related_words("food")
         self.assertIsInstance(related, list)
         self.assertGreater(len(related), 0)
     
+    def test_find_related_words_memoized(self):
+        """Test that expansions are cached per (word, depth, relations) and batchable."""
+        cache = self.lotus.resources.related_cache
+        related = self.lotus.find_related_words("Dog")
+        self.assertEqual(related[0], "dog")
+        self.assertEqual(len(related), len(set(related)))
+        hits = cache.hits
+        self.assertEqual(self.lotus.find_related_words("dog"), related)
+        self.assertEqual(cache.hits, hits + 1)
+        
+        batch = self.lotus.find_related_words_batch(["cat", "dog", "animal"])
+        self.assertEqual(batch[1], tuple(related))
+        self.assertEqual(list(batch[0]), self.lotus.find_related_words("cat"))
+        
+        # Fewer relations or hypernym levels only ever narrow the expansion
+        synonyms = self.lotus.find_related_words("dog", relations={"synonyms"})
+        shallow = self.lotus.find_related_words("dog", depth=1)
+        self.assertLess(set(synonyms), set(related))
+        self.assertLess(set(shallow), set(related))
+
+    def test_find_related_words_batch_shares_walk(self):
+        """Test that a batch looks up each synset's relations only once."""
+        from nltk.corpus.reader.wordnet import Synset
+        walked = []
+        hypernyms = Synset.hypernyms
+        def spy(synset):
+            walked.append(synset)
+            return hypernyms(synset)
+
+        self.lotus.resources.related_cache.clear()
+        with mock.patch.object(Synset, "hypernyms", spy):
+            batch = self.lotus.find_related_words_batch(["cat", "lion"])
+        self.assertEqual(len(walked), len(set(walked)))
+        # Both reach feline.n.01 (via big_cat.n.01 for "lion") before their last level
+        self.assertIn("feline.n.01", [synset.name() for synset in walked])
+        self.lotus.resources.related_cache.clear()
+        self.assertEqual(batch, [tuple(self.lotus.find_related_words(w)) for w in ("cat", "lion")])
+
+    def test_find_related_words_hash_seed(self):
+        """Test that the expansion order does not depend on the hash seed."""
+        src = os.path.join(os.path.dirname(__file__), '..', 'src')
+        script = ("from schemata import Lotus; lotus = Lotus(); "
+                  "print([lotus.find_related_words(w) for w in ('food', 'dog')])")
+        outputs = [
+            subprocess.run([sys.executable, "-W", "ignore", "-c", script], capture_output=True, text=True,
+                           env=dict(os.environ, PYTHONPATH=src, PYTHONHASHSEED=seed), check=True).stdout
+            for seed in ("1", "2")
+        ]
+        self.assertEqual(outputs[0], outputs[1])
+
     def test_generate_themed_pun(self):
         """Test themed pun generation."""
         lotus = Lotus("food")
         # Should not raise an exception
         self.assertIsNotNone(lotus)
+    
+    def test_themed_pun_result(self):
+        """Test that themed generation returns a structured Pun."""
+        lotus = Lotus(generate=False)
+        pun = lotus.generate_themed_pun("food")
+        if pun is not None:
+            self.assertIsInstance(pun, Pun)
+            self.assertTrue(pun.question.startswith("What do you call"))
+            self.assertEqual(pun.theme, "food")
+            self.assertGreater(pun.score, 0.0)
+            self.assertEqual(lotus.found_puns, [pun])
+            self.assertEqual(set(pun.to_dict()),
+                             {"question", "answer", "compound", "homophone", "score", "theme"})
+    
+    def test_shared_resources(self):
+        """Test that instances share the process-wide lexical resources."""
+        lotus = Lotus(generate=False)
+        self.assertIs(lotus.resources, self.lotus.resources)
+        self.assertIs(lotus.nplist, self.lotus.nplist)
+
+
+class TestLexicalResources(unittest.TestCase):
+    """Test cases for injecting lexical resources into Lotus."""
+    
+    def test_injected_resources(self):
+        """Test that Lotus uses injected resources and can skip generation."""
+        resources = LexicalResources(
+            ["meat_grinder"],
+            None,
+            PhoneticIndex({"meat": [["M", "IY1", "T"]], "meet": [["M", "IY1", "T"]]}),
+        )
+        lotus = Lotus("food", resources=resources, generate=False)
+        self.assertIs(lotus.resources, resources)
+        self.assertEqual(lotus.nplist, ["meat_grinder"])
+        self.assertEqual(lotus.found_puns, [])
+        self.assertEqual(lotus.getHomophone("meat"), "meet")
+        self.assertEqual(lotus.getHomophone("xyzzy"), 0)
+    
+    def test_compounds_containing(self):
+        """Test direct compound lookup through the lexeme index."""
+        resources = LexicalResources(
+            ["meat_grinder", "Swiss_cheese", "cheese_grater", "pepper_mill"],
+            None,
+            PhoneticIndex({}),
+        )
+        self.assertEqual(resources.compounds_containing({"cheese", "meat"}),
+                         ["meat_grinder", "Swiss_cheese", "cheese_grater"])
+        self.assertEqual(resources.compounds_containing({"swiss"}), ["Swiss_cheese"])
+        self.assertEqual(resources.compounds_containing({"xyzzy"}), [])
+
+    def test_compound_table(self):
+        """Test the integer-ID view of the compound list."""
+        names = ["meat_grinder", "Swiss_cheese", "cheese_grater", "pepper_mill"]
+        table = lexicon.CompoundTable(names)
+        self.assertEqual(len(table), 4)
+        self.assertEqual(len(table.lexemes), 7)
+        compound = table[1]
+        self.assertEqual((compound.name, compound.modifier, compound.head),
+                         ("Swiss_cheese", "swiss", "cheese"))
+        self.assertEqual(compound.head_id, table.modifiers[2])
+        self.assertEqual(table[-1].name, "pepper_mill")
+        with self.assertRaises(IndexError):
+            table[4]
+        self.assertEqual(list(table.parts([0, 3])), [("meat", "grinder"), ("pepper", "mill")])
+        self.assertEqual(table.positions_containing({"cheese", "mill"}), [1, 2, 3])
+        self.assertIsNone(table.lexeme_id("xyzzy"))
+        
+        # Scoring from the table's lexemes matches scoring from the names
+        shared = lexicon.get_shared_resources()
+        lotus = Lotus(generate=False)
+        scorer = RelevanceScorer(lotus.semantic_similarity, "cheese", ["food", "dairy"])
+        compounds = shared.compounds[:300] + names
+        parts = lexicon.CompoundTable(compounds).parts(range(len(compounds)))
+        self.assertEqual(scorer.top_k(compounds, 10, 0.3, parts), scorer.top_k(compounds, 10, 0.3))
+
+    def test_pun_table(self):
+        """Test that the precomputed pun table gives the same puns as live lookup."""
+        shared = lexicon.get_shared_resources()
+        compounds = ["serial_killer", "meat_grinder", "xyzzy_plugh"] + shared.compounds[:300]
+        live = LexicalResources(compounds, None, shared.phonetic_index)
+        live_lotus = Lotus(resources=live, generate=False)
+        table = live_lotus.build_pun_table()
+        self.assertNotIn("xyzzy_plugh", table)
+
+        precomputed = LexicalResources(compounds, None, shared.phonetic_index, table)
+        lotus = Lotus(resources=precomputed, generate=False)
+        self.assertEqual(lotus._viable_compounds(compounds), [c for c in compounds if c in table])
+        for compound in compounds:
+            self.assertEqual(lotus._build_pun(compound), live_lotus._build_pun(compound))
+
+    def test_hypernym_index(self):
+        """Test that indexed hypernym IDs match those read from WordNet."""
+        index = lexicon.HypernymIndex(array('I', [10, 20, 30]), array('I', [0, 0, 1, 3]),
+                                      array('I', [10, 10, 20]), array('I', [0, 0, 0, 1]),
+                                      array('I', [10]))
+        self.assertEqual(index.ancestors(30), (frozenset({10, 20}), frozenset({10})))
+        self.assertEqual(index.ancestors(10), (frozenset(), frozenset()))
+        self.assertIsNone(index.ancestors(25))
+
+        # The shared resources carry the full index when loaded from a snapshot
+        shared = lexicon.get_shared_resources()
+        indexed = Lotus(resources=shared, generate=False)
+        live = Lotus(resources=LexicalResources(shared.compounds, None, shared.phonetic_index),
+                     generate=False)
+        for word1, word2 in [("dog", "cat"), ("car", "truck"), ("food", "meal"),
+                             ("oak", "pine"), ("dog", "computer"), ("xyzzy", "dog")]:
+            self.assertEqual(shared.hypernym_ids(word1), live.resources.hypernym_ids(word1))
+            self.assertEqual(indexed._relationship_similarity(word1, word2),
+                             live._relationship_similarity(word1, word2))
+        self.assertEqual(live._relationship_similarity("dog", "cat"), 0.4)
+
+
+class TestPunDisplay(unittest.TestCase):
+    """Test cases for the pun presentation layer."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        resources = LexicalResources([], None, PhoneticIndex({}))
+        self.lotus = Lotus(resources=resources, generate=False)
+        self.pun = Pun("What do you call a murderer that has fiber?", "cereal killer",
+                       "serial_killer", "cereal", 1.0, "food")
+    
+    def _display(self, *args):
+        output = io.StringIO()
+        with mock.patch("schemata.time.sleep") as sleep, redirect_stdout(output):
+            self.lotus._display_pun_with_countdown(*args)
+        return output.getvalue(), sleep.call_count
+    
+    def test_display_without_countdown(self):
+        """Test that the default presenter never sleeps."""
+        output, sleeps = self._display(self.pun)
+        self.assertIn(self.pun.question, output)
+        self.assertIn("A cereal killer!", output)
+        self.assertEqual(sleeps, 0)
+    
+    def test_display_with_countdown(self):
+        """Test the interactive countdown reveal."""
+        output, sleeps = self._display(self.pun, 3)
+        self.assertIn("3...2...1...", output)
+        self.assertEqual(sleeps, 3)
+    
+    def test_display_no_pun(self):
+        """Test the message shown when no pun was found."""
+        output, _ = self._display(None)
+        self.assertIn("couldn't come up with a good pun", output)
+
+
+class TestRelevanceScorer(unittest.TestCase):
+    """Test cases for batch compound relevance scoring."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.calls = []
+        
+        def similarity(word1, word2):
+            self.calls.append((word1, word2))
+            return 0.5 if word2 == "oven" else 0.0
+        
+        self.scorer = RelevanceScorer(similarity, "food", ["meal", "dish"])
+    
+    def test_part_scores(self):
+        """Test direct, related and similarity-based part scores."""
+        self.assertEqual(self.scorer.part_score("Food"), 1.0)
+        self.assertEqual(self.scorer.part_score("dish"), 0.9)
+        self.assertEqual(self.scorer.part_score("oven"), 0.5)
+        self.assertEqual(self.scorer.part_score("tire"), 0.0)
+    
+    def test_rank(self):
+        """Test that ranking keeps input order for ties and applies the threshold."""
+        ranked = self.scorer.rank(
+            ["dutch_oven", "food_court", "spare_tire", "brick_oven", "dish_rack"], 0.3)
+        self.assertEqual(ranked, [
+            ("food_court", 1.0),
+            ("dish_rack", 0.9),
+            ("dutch_oven", 0.5),
+            ("brick_oven", 0.5),
+        ])
+    
+    def test_parts_scored_once(self):
+        """Test that shared parts are only compared once per batch."""
+        self.scorer.rank(["dutch_oven", "brick_oven"])
+        oven_calls = [call for call in self.calls if call[1] == "oven"]
+        self.assertEqual(len(oven_calls), 3)
+
+    def test_top_k_matches_rank(self):
+        """Test that top_k returns the head of the full ranking."""
+        compounds = ["dutch_oven", "food_court", "spare_tire", "brick_oven", "dish_rack",
+                     "meal_ticket", "oven_mitt"]
+        for k in range(1, len(compounds) + 1):
+            scorer = RelevanceScorer(self.scorer.similarity, "food", ["meal", "dish"],
+                                     lambda word1, word2: 0.5, 0.5)
+            self.assertEqual(scorer.top_k(compounds, k, 0.3),
+                             self.scorer.rank(compounds, 0.3)[:k])
+
+    def test_top_k_prunes_and_stops_early(self):
+        """Test that bounded-out parts are never scored exactly."""
+        scorer = RelevanceScorer(self.scorer.similarity, "food", ["meal", "dish"],
+                                 lambda word1, word2: 0.5, 0.5)
+        top = scorer.top_k(["food_court", "dish_rack", "brick_oven", "food_truck", "spare_tire"], 2)
+        self.assertEqual(top, [("food_court", 1.0), ("food_truck", 1.0)])
+        # The heap held 0.9 when brick_oven came up, and 0.5 cannot beat it
+        self.assertNotIn("oven", [call[1] for call in self.calls])
+        # Two perfect scores fill the heap, so spare_tire is never looked at
+        self.assertNotIn("tire", scorer._part_scores)
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for the bounded LRU cache."""
+    
+    def test_eviction_order(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.items(), [("a", 1), ("c", 3)])
+    
+    def test_stats(self):
+        """Test hit, miss and eviction counters."""
+        cache = LRUCache(maxsize=1)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        cache.put("b", 2)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+
+class TestThemeCache(unittest.TestCase):
+    """Test cases for the persistent theme cache."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "themes.sqlite")
+        self.pun = {"question": "What do you call a mill that meets?", "answer": "meet grinder",
+                    "compound": "meat_grinder", "homophone": "meet", "score": 0.9, "theme": "food"}
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmpdir.cleanup()
+    
+    def test_roundtrip_and_persistence(self):
+        """Test that entries survive reopening and match normalized themes."""
+        cache = ThemeCache(self.path, "v1")
+        cache.put("food", [self.pun])
+        cache.put("xyzzyq", [])
+        cache.close()
+        
+        cache = ThemeCache(self.path, "v1")
+        self.assertEqual(cache.get("  Food "), [self.pun])
+        self.assertEqual(cache.get("xyzzyq"), [])
+        self.assertIsNone(cache.get("music"))
+        self.assertEqual(cache.stats()["hits"], 2)
+        cache.close()
+    
+    def test_version_isolation(self):
+        """Test that entries from another lexicon version are not served."""
+        cache = ThemeCache(self.path, "v1")
+        cache.put("food", [self.pun])
+        cache.close()
+        cache = ThemeCache(self.path, "v2")
+        self.assertIsNone(cache.get("food"))
+        # Writers on another version share the file without evicting each other
+        cache.put("cake", [])
+        cache.close()
+        cache = ThemeCache(self.path, "v1")
+        self.assertEqual(cache.get("food"), [self.pun])
+        self.assertEqual(len(cache), 2)
+        cache.close()
+        with self.assertRaises(ValueError):
+            ThemeCache(self.path, None)
+    
+    def test_version_from_resources(self):
+        """Test that generators key the theme cache on the resources in use."""
+        resources = LexicalResources([], None, PhoneticIndex({}), version="v9")
+        generator = PunDatasetGenerator(resources=resources, theme_cache_path=self.path)
+        lotus = generator._get_lotus()
+        self.assertTrue(lotus.theme_cache.version.endswith(":v9"))
+        lotus.theme_cache.close()
+    
+    def test_ttl_and_size_eviction(self):
+        """Test expiry by age and eviction of the oldest entries."""
+        cache = ThemeCache(self.path, "v1", ttl=60, max_entries=2)
+        with mock.patch("cache.time.time", return_value=1000.0):
+            cache.put("food", [self.pun])
+        with mock.patch("cache.time.time", return_value=1010.0):
+            cache.put("cake", [self.pun])
+            cache.put("soup", [self.pun])
+            self.assertIsNone(cache.get("food"))
+            self.assertEqual(len(cache), 2)
+        with mock.patch("cache.time.time", return_value=1100.0):
+            self.assertIsNone(cache.get("cake"))
+        cache.close()
+    
+    def test_lotus_uses_cache(self):
+        """Test that Lotus serves cached themes without regenerating them."""
+        cache = ThemeCache(self.path, "v1")
+        cache.put("food", [self.pun])
+        resources = LexicalResources([], None, PhoneticIndex({}))
+        lotus = Lotus(resources=resources, generate=False, theme_cache=cache)
+        pun = lotus.generate_themed_pun("Food")
+        self.assertEqual(pun.answer, "meet grinder")
+        self.assertEqual(pun.theme, "food")
+        self.assertEqual(lotus.found_puns, [pun])
+        
+        # Misses are generated from the normalized theme they are stored under
+        with mock.patch.object(lotus, "_generate_themed_pun", return_value=None) as generate:
+            self.assertIsNone(lotus.generate_themed_pun(" Cake  "))
+        generate.assert_called_once_with("cake")
+        self.assertEqual(cache.get("cake"), [])
+        cache.close()
+
+
+class TestPhoneticIndex(unittest.TestCase):
+    """Test cases for the phonetic inverted index."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.index = PhoneticIndex({
+            "cereal": [["S", "IH1", "R", "IY0", "AH0", "L"]],
+            "meat": [["M", "IY1", "T"]],
+            "meet": [["M", "IY1", "T"]],
+            "mete": [["M", "IY1", "T"]],
+            "serial": [["S", "IH1", "R", "IY0", "AH0", "L"]],
+        })
+    
+    def test_first_homophone(self):
+        """Test homophone lookup returns the first match in dictionary order."""
+        self.assertEqual(self.index.first_homophone("cereal"), "serial")
+        self.assertEqual(self.index.first_homophone("mete"), "meat")
+        self.assertEqual(self.index.homophones("meat"), ["meet", "mete"])
+    
+    def test_unknown_word(self):
+        """Test lookup of words missing from the dictionary."""
+        self.assertNotIn("xyzzy", self.index)
+        self.assertIsNone(self.index.first_homophone("xyzzy"))
+        self.assertEqual(self.index.homophones("xyzzy"), [])
+
+
+class TestLexiconSnapshot(unittest.TestCase):
+    """Test cases for the on-disk lexicon snapshot."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "lexicon.pickle")
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmpdir.cleanup()
+    
+    def _write(self, snapshot):
+        with open(self.path, "wb") as f:
+            pickle.dump(snapshot, f)
+    
+    def test_missing_snapshot(self):
+        """Test that a missing snapshot is reported as None."""
+        self.assertIsNone(lexicon.load_snapshot(self.path))
+    
+    def test_valid_snapshot(self):
+        """Test that a snapshot matching the installed data loads."""
+        self._write({
+            "format": lexicon.SNAPSHOT_FORMAT,
+            "fingerprint": lexicon.corpus_fingerprint(),
+            "compounds": ["meat_grinder"],
+            "pronunciations": {},
+            "pun_table": {},
+            "hypernym_index": {},
+        })
+        snapshot = lexicon.load_snapshot(self.path)
+        self.assertEqual(snapshot["compounds"], ["meat_grinder"])
+    
+    def test_stale_snapshot(self):
+        """Test that snapshots built from other NLTK data are ignored."""
+        self._write({
+            "format": lexicon.SNAPSHOT_FORMAT,
+            "fingerprint": "stale",
+            "compounds": ["meat_grinder"],
+            "pronunciations": {},
+            "pun_table": {},
+            "hypernym_index": {},
+        })
+        self.assertIsNone(lexicon.load_snapshot(self.path))
+    
+    def test_frequency_table(self):
+        """Test that the memory-mapped frequency table answers like a FreqDist."""
+        counts = {"the": 120, "cat": 7, "café": 2, "zebra": 1, "a": 40}
+        path = os.path.join(self.tmpdir.name, "frequencies.bin")
+        fingerprint = lexicon.corpus_fingerprint(lexicon.FREQUENCY_TABLE_CORPORA)
+        lexicon.write_frequency_table(path, counts, fingerprint)
+        table = lexicon.load_frequency_table(path)
+        self.assertEqual(len(table), 5)
+        self.assertEqual(table.N(), 170)
+        for word, count in counts.items():
+            self.assertEqual(table.get(word), count)
+            self.assertIn(word, table)
+        self.assertEqual(table.get("dog", 1), 1)
+        self.assertEqual(table["dog"], 0)
+        self.assertNotIn("", table)
+        
+        # Information content is the same as with an in-memory FreqDist
+        from nltk.probability import FreqDist
+        shared = lexicon.get_shared_resources()
+        mapped = Lotus(resources=LexicalResources(["meat_grinder"], table, shared.phonetic_index),
+                       generate=False)
+        in_memory = Lotus(resources=LexicalResources(["meat_grinder"], FreqDist(counts),
+                                                     shared.phonetic_index), generate=False)
+        for word1, word2 in [("the", "cat"), ("cat", "dog"), ("Zebra", "café")]:
+            self.assertEqual(mapped._information_content_similarity(word1, word2),
+                             in_memory._information_content_similarity(word1, word2))
+    
+    def test_invalid_frequency_table(self):
+        """Test that stale, truncated or foreign frequency tables are ignored."""
+        path = os.path.join(self.tmpdir.name, "frequencies.bin")
+        self.assertIsNone(lexicon.load_frequency_table(path))
+        lexicon.write_frequency_table(path, {"cat": 7}, "0" * 40)
+        self.assertIsNone(lexicon.load_frequency_table(path))
+        
+        fingerprint = lexicon.corpus_fingerprint(lexicon.FREQUENCY_TABLE_CORPORA)
+        lexicon.write_frequency_table(path, {"cat": 7}, fingerprint)
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data[:-2])
+        self.assertIsNone(lexicon.load_frequency_table(path))
+        self._write({"format": lexicon.SNAPSHOT_FORMAT})
+        self.assertIsNone(lexicon.load_frequency_table(self.path))
+    
+    def test_frequency_sources(self):
+        """Test compiling frequency tables from text and counts file sources."""
+        text_path = os.path.join(self.tmpdir.name, "corpus.txt")
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write("The cat sat.\nThe dog, the cat!\n42 Ignored_digits\n")
+        counts_path = os.path.join(self.tmpdir.name, "counts.tsv")
+        with open(counts_path, "w", encoding="utf-8") as f:
+            f.write("# word count\nthe 3\ncat 2\n\ndog 1\nsat 1\nignored 1\ndigits 1\n")
+        
+        path = os.path.join(self.tmpdir.name, "frequencies.bin")
+        for source in ("text:" + text_path, "counts:" + counts_path):
+            table = lexicon.build_frequency_table(path, source)
+            self.assertEqual(table.N(), 9)
+            self.assertEqual(table.get("the"), 3)
+            self.assertEqual(table.ic_mode, lexicon.WORD_IC)
+            self.assertAlmostEqual(table.information_content("cat"), -math.log(2 / 9))
+            self.assertAlmostEqual(table.information_content("xyzzy"), -math.log(1 / 9))
+            # A table only loads for the source it was compiled from
+            self.assertIsNotNone(lexicon.load_frequency_table(path, source))
+            self.assertIsNone(lexicon.load_frequency_table(path, "counts:" + text_path + ".other"))
+        
+        with open(counts_path, "a", encoding="utf-8") as f:
+            f.write("not-a-count\n")
+        os.utime(counts_path, (0, 0))
+        self.assertIsNone(lexicon.load_frequency_table(path, "counts:" + counts_path))
+        with self.assertRaises(ValueError):
+            lexicon.build_frequency_table(path, "counts:" + counts_path)
+        with self.assertRaises(ValueError):
+            lexicon.build_frequency_table(path, "xyzzy:" + counts_path)
+        
+        # Missing files are unavailable sources, and runtime lookups degrade to no counts
+        missing = os.path.join(self.tmpdir.name, "missing")
+        for source in ("text:" + missing, "counts:" + missing):
+            self.assertIsNone(lexicon.build_frequency_table(path, source))
+        for source in ("counts:" + missing, "counts:" + counts_path, "xyzzy:" + counts_path):
+            with mock.patch.object(lexicon, "load_frequency_table", return_value=None), \
+                    mock.patch.object(lexicon, "DEFAULT_FREQUENCY_SOURCE", source):
+                self.assertIsNone(lexicon.word_frequencies())
+
+    def test_lexicon_version_live_source(self):
+        """Test that without a frequency table the version follows the active source."""
+        versions = set()
+        for name in ("a.tsv", "b.tsv"):
+            with mock.patch.object(lexicon, "load_frequency_table", return_value=None), \
+                    mock.patch.object(lexicon, "DEFAULT_FREQUENCY_SOURCE",
+                                      "counts:" + os.path.join(self.tmpdir.name, name)):
+                versions.add(lexicon.lexicon_version())
+        self.assertEqual(len(versions), 2)
+
+    def test_synset_information_content(self):
+        """Test that synset IC credits general senses with their hyponyms' counts."""
+        counts_path = os.path.join(self.tmpdir.name, "counts.tsv")
+        with open(counts_path, "w", encoding="utf-8") as f:
+            f.write("the 100\ndog 10\ncat 10\nanimal 5\n")
+        path = os.path.join(self.tmpdir.name, "frequencies.bin")
+        source = "counts:" + counts_path
+        
+        words = lexicon.build_frequency_table(path, source)
+        self.assertGreater(words.information_content("animal"), words.information_content("dog"))
+        synsets = lexicon.build_frequency_table(path, source, lexicon.SYNSET_IC)
+        self.assertEqual(synsets.ic_mode, lexicon.SYNSET_IC)
+        self.assertLess(synsets.information_content("animal"), synsets.information_content("dog"))
+        # Nouns never counted still get the IC of what their sense subsumes
+        self.assertIn("organism", synsets)
+        self.assertEqual(synsets.get("organism"), 0)
+        self.assertLess(synsets.information_content("organism"),
+                        synsets.information_content("animal"))
+        # Words without a noun sense keep their word IC
+        self.assertEqual(synsets.information_content("the"), words.information_content("the"))
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases for per-stage timing instrumentation."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.instrumentation = Instrumentation()
+        shared = lexicon.get_shared_resources()
+        resources = LexicalResources(["serial_killer"], None, shared.phonetic_index)
+        self.lotus = Lotus(resources=resources, generate=False,
+                           instrumentation=self.instrumentation)
+    
+    def test_request_record(self):
+        """Test that a themed request records its stages and cache hit rates."""
+        self.lotus.generate_themed_pun("food")
+        record = self.instrumentation.last_request
+        self.assertEqual(record["label"], "food")
+        self.assertGreater(record["seconds"], 0.0)
+        self.assertIn("find_related_words", record["stages"])
+        self.assertIn("scoring", record["stages"])
+        self.assertIn("similarity", record["caches"])
+        self.assertEqual(json.loads(self.instrumentation.to_json_line()), record)
+        self.assertEqual(self.instrumentation.to_dict()["requests"], 1)
+    
+    def test_prometheus_export(self):
+        """Test the Prometheus text exposition output."""
+        with self.instrumentation.request("manual"):
+            with self.instrumentation.stage("scoring"):
+                pass
+        text = self.instrumentation.to_prometheus()
+        self.assertIn("pun_requests_total 1", text)
+        self.assertIn('pun_stage_calls_total{stage="scoring"} 1', text)
+        self.assertIn("# TYPE pun_stage_seconds_total counter", text)
+    
+    def test_merge_worker_records(self):
+        """Test that records from other processes feed totals and percentiles."""
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            self.instrumentation.add_request(
+                {"label": "x", "seconds": seconds, "caches": {},
+                 "stages": {"scoring": {"calls": 1, "seconds": seconds / 2}}})
+        percentiles = self.instrumentation.percentiles()
+        self.assertEqual(percentiles["request"]["p50"], 0.2)
+        self.assertEqual(percentiles["scoring"]["p99"], 0.2)
+        self.assertEqual(self.instrumentation.stage_totals["scoring"][0], 4)
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 90), 4)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test cases for the benchmark baseline comparison."""
+    
+    def test_compare(self):
+        """Test that only benchmarks slower than the tolerance are flagged."""
+        baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 2.0}, "old": {"median": 1.0}}}
+        current = {"results": {"a": {"median": 1.1}, "b": {"median": 3.0}, "new": {"median": 1.0}}}
+        rows = run_benchmarks.compare(current, baseline, tolerance=0.2)
+        self.assertEqual([(row[0], row[4]) for row in rows], [("a", False), ("b", True)])
+        self.assertIn("SLOWER", run_benchmarks.format_comparison(rows))
+    
+    def test_summarize(self):
+        """Test the per-benchmark summary statistics."""
+        summary = run_benchmarks.summarize([0.3, 0.1, 0.2], calls=10)
+        self.assertEqual(summary["median"], 0.2)
+        self.assertEqual(summary["min"], 0.1)
+        self.assertAlmostEqual(summary["per_call"], 0.02)
+
+
+class TestVerbLexicon(unittest.TestCase):
+    """Test cases for the precompiled verb lexicon."""
+    
+    WORDS = ["meeting", "grain", "creation", "fiber", "running", "decision", "teacher",
+             "swimming", "agreement", "arrival", "dogs", "geese", "went", "xyzzy"]
+    
+    @classmethod
+    def setUpClass(cls):
+        """Compile the lexicon once, with derived verbs for the test words only."""
+        cls.verbs = lexicon.verb_lexicon_from_wordnet(cls.WORDS)
+    
+    def test_matches_wordnet(self):
+        """Test that verb checks and lemmas match live WordNet."""
+        live = GrammaticalTemplate(verb_lexicon=False)
+        for word in self.WORDS + ["Meeting", "flies", "axes", ""]:
+            self.assertEqual(self.verbs.is_verb(word), live._is_verb(word), word)
+            for pos in ("n", "v"):
+                self.assertEqual(self.verbs.lemmatize(word, pos), live._lemma(word, pos), word)
+    
+    def test_verb_phrases(self):
+        """Test that the grammar layer gives the same phrases with the lexicon."""
+        live = GrammaticalTemplate(verb_lexicon=False)
+        compiled = GrammaticalTemplate(verb_lexicon=self.verbs)
+        self.assertIs(compiled.verb_lexicon, self.verbs)
+        self.assertIsNone(live.verb_lexicon)
+        self.assertEqual(compiled.create_verb_phrases(self.WORDS),
+                         live.create_verb_phrases(self.WORDS))
+    
+    def test_missing_artifact(self):
+        """Test that a missing verb lexicon file is reported as None."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.assertIsNone(lexicon.load_verb_lexicon(os.path.join(tmpdir, "verbs.pickle")))
 
 
 class TestGrammaticalTemplate(unittest.TestCase):
@@ -67,6 +752,15 @@ class TestGrammaticalTemplate(unittest.TestCase):
         self.assertIsNotNone(self.template)
         self.assertIsNotNone(self.template.lemmatizer)
     
+    def test_lazy_imports(self):
+        """Test that importing the entry points does not import NLTK."""
+        src = os.path.join(os.path.dirname(__file__), '..', 'src')
+        script = ("import sys, templates, schemata, generate_dataset, server, lexicon; "
+                  "print('nltk' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=src), check=True)
+        self.assertEqual(result.stdout.strip(), "False")
+    
     def test_find_verb_form_automatic(self):
         """Test automatic verb form detection."""
         # Test -ing form
@@ -90,6 +784,56 @@ class TestGrammaticalTemplate(unittest.TestCase):
         # Test verb ending in y
         result = self.template._conjugate_verb_automatic("try")
         self.assertEqual(result, "tries")
+    
+    def test_create_verb_phrases(self):
+        """Test that batch conversion matches per-word conversion, in input order."""
+        words = ["meeting", "Meeting ", "grain", None, "creation", "meeting", "swimming"]
+        expected = [GrammaticalTemplate()._create_verb_phrase(word) for word in words]
+        self.assertEqual(self.template.create_verb_phrases(words), expected)
+        self.assertEqual(self.template.create_verb_phrases([]), [])
+        # Verb probes are shared across words rather than repeated
+        self.assertIn("meeting", self.template._is_verb_cache)
+    
+    def test_bounded_caches(self):
+        """Test that the memo caches are bounded and report their counters."""
+        template = GrammaticalTemplate(phrase_cache_size=2, word_cache_size=4)
+        template.create_verb_phrases(["meeting", "grain", "creation", "swimming"])
+        stats = template.cache_stats()
+        self.assertEqual(set(stats), {"verb_phrases", "pos", "is_verb", "lemmas"})
+        self.assertEqual(stats["verb_phrases"]["size"], 2)
+        self.assertGreater(stats["verb_phrases"]["evictions"], 0)
+        self.assertLessEqual(stats["is_verb"]["size"], 4)
+        
+        template._create_verb_phrase("swimming")
+        self.assertEqual(template.cache_stats()["verb_phrases"]["hits"], 1)
+    
+    def test_concurrent_verb_phrases(self):
+        """Test that threads sharing one template get the single-threaded results."""
+        words = ["meeting", "grain", "creation", "swimming", "teacher", "runner"] * 20
+        expected = [GrammaticalTemplate()._create_verb_phrase(word) for word in words]
+        template = GrammaticalTemplate(phrase_cache_size=3, word_cache_size=5)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(template._create_verb_phrase, words))
+        self.assertEqual(results, expected)
+    
+    def test_save_and_preload_cache(self):
+        """Test that saved verb phrases are served from a preloaded cache."""
+        self.template.create_verb_phrases(["meeting", "grain"])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "grammar.json")
+            self.template.save_cache(path)
+            
+            preloaded = GrammaticalTemplate()
+            self.assertEqual(preloaded.preload_cache(path), 2)
+            self.assertEqual(preloaded._create_verb_phrase("grain"),
+                             self.template._create_verb_phrase("grain"))
+            self.assertEqual(preloaded.cache_stats()["verb_phrases"]["hits"], 1)
+            
+            # Missing, corrupt or foreign files load nothing
+            self.assertEqual(preloaded.preload_cache(os.path.join(tmpdir, "missing.json")), 0)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"format": -1, "verb_phrases": {"grain": "x"}, "pos": {}}, f)
+            self.assertEqual(GrammaticalTemplate().preload_cache(path), 0)
 
 
 class TestPunDatasetGenerator(unittest.TestCase):
@@ -114,6 +858,121 @@ class TestPunDatasetGenerator(unittest.TestCase):
             self.assertIsInstance(question, str)
             self.assertIsInstance(answer, str)
             self.assertIn("What do you call", question)
+    
+    def test_streaming_resume(self):
+        """Test that a streamed run resumes from its checkpoint."""
+        def fake_output(theme_word):
+            return ("What do you call a mill that meets?", "meet grinder") if theme_word == "food" else (None, None)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "dataset.jsonl")
+            first = PunDatasetGenerator(stream_path=path)
+            with mock.patch.object(first, "capture_pun_output", side_effect=fake_output), \
+                    redirect_stdout(io.StringIO()):
+                first.generate_dataset(["food", "xyzzyq"])
+            self.assertEqual(first.dataset, [])
+            
+            # Simulate a crash midway through writing a record
+            with open(path, "a", encoding="utf-8") as f:
+                f.write('{"index": 2, "theme_')
+            
+            second = PunDatasetGenerator(stream_path=path)
+            with mock.patch.object(second, "capture_pun_output", side_effect=fake_output) as capture, \
+                    redirect_stdout(io.StringIO()):
+                second.generate_dataset(["food", "xyzzyq", "food"])
+            capture.assert_called_once_with("food")
+            # Totals cover the themes recorded by the first run as well
+            self.assertEqual(second.successful_puns, 2)
+            self.assertEqual(second.failed_themes, ["xyzzyq"])
+
+            entries = list(second.stream.entries())
+            self.assertEqual([entry['theme_word'] for entry in entries], ["food", "food"])
+            
+            # A changed theme list reruns the moved themes, and only its own results are saved
+            third = PunDatasetGenerator(stream_path=path)
+            with mock.patch.object(third, "capture_pun_output", side_effect=fake_output), \
+                    redirect_stdout(io.StringIO()):
+                third.generate_dataset(["xyzzyq", "food"])
+            entries = list(third.stream.entries(third.theme_words))
+            self.assertEqual([entry['theme_word'] for entry in entries], ["food"])
+            self.assertEqual(third.successful_puns, 1)
+            with redirect_stdout(io.StringIO()):
+                third.save_dataset(os.path.join(tmpdir, "saved"))
+            with open(os.path.join(tmpdir, "saved.json"), encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)), 1)
+    
+    def test_generate_dataset_parallel(self):
+        """Test that parallel generation reports results in input order."""
+        themes = ["food", "xyzzyq", "food"]
+        self.generator.generate_dataset(themes, workers=2)
+        recorded = [entry['theme_word'] for entry in self.generator.dataset]
+        self.assertEqual(recorded, [t for t in themes if t not in self.generator.failed_themes])
+        self.assertIn("xyzzyq", self.generator.failed_themes)
+    
+    def test_profile_percentiles(self):
+        """Test that a profiled run prints latency percentiles."""
+        generator = PunDatasetGenerator(profile=True)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            generator.generate_dataset(["food", "xyzzyq"])
+        self.assertEqual(len(generator.instrumentation.requests), 2)
+        self.assertIn("Latency percentiles over 2 themes", output.getvalue())
+
+
+class TestPunServer(unittest.TestCase):
+    """Test cases for the HTTP pun server routing."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.server = PunServer()
+    
+    def _route(self, request_line):
+        return asyncio.run(self.server.route(request_line))
+    
+    def test_health(self):
+        """Test the health check endpoint."""
+        self.assertEqual(self._route(b"GET /health HTTP/1.1\r\n"), (200, {"status": "ok"}))
+    
+    def test_request_errors(self):
+        """Test responses to malformed or unsupported requests."""
+        self.assertEqual(self._route(b"\r\n")[0], 400)
+        self.assertEqual(self._route(b"POST /pun?theme=food HTTP/1.1\r\n")[0], 405)
+        self.assertEqual(self._route(b"GET /joke HTTP/1.1\r\n")[0], 404)
+        self.assertEqual(self._route(b"GET /pun?theme= HTTP/1.1\r\n")[0], 400)
+
+    def test_serve_over_socket(self):
+        """Test a real GET /pun through the worker pool, and timing out an idle client."""
+        resources = LexicalResources(
+            ["meat_grinder"],
+            None,
+            PhoneticIndex({"meat": [["M", "IY1", "T"]], "meet": [["M", "IY1", "T"]]}),
+        )
+        server = PunServer(port=0, workers=1, resources=resources, request_timeout=0.5)
+
+        async def request(data):
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(data)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(body)
+
+        async def run():
+            await server.start()
+            try:
+                return (await request(b"GET /pun?theme=Food HTTP/1.1\r\nHost: localhost\r\n\r\n"),
+                        await request(b"GET /pun?theme=food HTTP/1.1\r\n"))
+            finally:
+                server.server.close()
+                await server.server.wait_closed()
+                server.executor.shutdown()
+
+        (status, pun), (idle_status, _) = asyncio.run(run())
+        self.assertEqual(status, 200)
+        self.assertEqual((pun["answer"], pun["theme"]), ("meet grinder", "food"))
+        # The second client never ends its headers
+        self.assertEqual(idle_status, 408)
 
 
 class TestDatasetFiles(unittest.TestCase):
@@ -189,8 +1048,19 @@ def run_tests():
     # Add test cases
     test_classes = [
         TestLotus,
+        TestLexicalResources,
+        TestPunDisplay,
+        TestRelevanceScorer,
+        TestLRUCache,
+        TestThemeCache,
+        TestPhoneticIndex,
+        TestLexiconSnapshot,
+        TestInstrumentation,
+        TestBenchmarks,
+        TestVerbLexicon,
         TestGrammaticalTemplate,
         TestPunDatasetGenerator,
+        TestPunServer,
         TestDatasetFiles,
         TestDocumentation
     ]